@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del Sistema Inteligente de Rutas de Transporte Masivo
+Compara los motores de búsqueda sobre redes aleatorias de distintos tamaños,
+Dijkstra frente al grafo de transbordos, las formas de serializar resultados
+y el coste de arranque de la CLI
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+
+from sistema_rutas import (RouteSearcher, RouteStreamWriter, build_random_kb, route_to_bytes,
+                           route_to_json)
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def random_kb_with_edges(target_edges: int, seed: int = 0):
+    """Red aleatoria con aproximadamente target_edges aristas dirigidas"""
+    stops_per_line = 50
+    walks_per_line = 5
+    n_lines = max(1, target_edges // (2 * (stops_per_line - 1 + walks_per_line)))
+    n_stations = max(stops_per_line, target_edges // 10)
+    return build_random_kb(n_stations, n_lines, stops_per_line,
+                           n_walks=n_lines * walks_per_line, seed=seed)
+
+
+def bench_one_to_all(sizes, queries: int = 3, workers: int = 1):
+    """Dijkstra de RouteSearcher frente a DeltaSteppingEngine (un origen a todos)"""
+    from delta_stepping import DeltaSteppingEngine, HAS_NUMPY
+
+    print("\n⚡ BENCHMARK UN ORIGEN A TODOS")
+    print("=" * 78)
+    print(f"NumPy: {'sí' if HAS_NUMPY else 'no (motor en Python puro)'} - workers: {workers}")
+    print(f"{'aristas':>9} {'estados':>9} {'prepr. (s)':>11} {'dijkstra (ms)':>14} "
+          f"{'delta (ms)':>11} {'speedup':>8} {'iguales':>8}")
+
+    for size in sizes:
+        kb = random_kb_with_edges(size)
+        searcher = RouteSearcher(kb)
+        kb.adjacency()  # índice compartido por ambos motores, fuera de la medición
+
+        start_time = time.perf_counter()
+        engine = DeltaSteppingEngine(kb, workers=workers)
+        build_time = time.perf_counter() - start_time
+
+        origins = [f"Estacion_{i}" for i in range(queries)]
+        dijkstra_time = delta_time = 0.0
+        equal = True
+        with engine:
+            for origin in origins:
+                start_time = time.perf_counter()
+                expected = searcher.one_to_all(origin)
+                dijkstra_time += time.perf_counter() - start_time
+
+                start_time = time.perf_counter()
+                obtained = engine.one_to_all(origin)
+                delta_time += time.perf_counter() - start_time
+
+                equal = equal and expected.keys() == obtained.keys() and all(
+                    abs(expected[s] - obtained[s]) < 1e-9 for s in expected)
+
+        dijkstra_ms = dijkstra_time / queries * 1000
+        delta_ms = delta_time / queries * 1000
+        print(f"{len(kb.edges):>9} {len(engine.states):>9} {build_time:>11.2f} "
+              f"{dijkstra_ms:>14.1f} {delta_ms:>11.1f} {dijkstra_ms / delta_ms:>7.2f}x "
+              f"{'✅' if equal else '❌':>7}")
+
+
+def bench_transfer(queries: int = 200, seed: int = 0):
+    """Dijkstra frente al grafo de transbordos: estados expandidos y tiempo por consulta"""
+    networks = (
+        # Misma forma que la red grande del corpus: casi todas las estaciones son clave
+        ("densa (corpus)", build_random_kb(3000, 300, 30, n_walks=375, seed=seed, one_way=0.2,
+                                           circular=0.2, integer_times=True)),
+        # Pocas líneas largas que apenas se cruzan: cadenas largas de la misma línea
+        ("cadenas", build_random_kb(20000, 60, 200, n_walks=60, seed=seed)),
+    )
+
+    print("\n🔀 BENCHMARK DEL GRAFO DE TRANSBORDOS")
+    print("=" * 78)
+    print(f"{'red':<15} {'estaciones':>10} {'clave':>6} {'motor':>9} {'expansiones':>12} "
+          f"{'ms/consulta':>12} {'speedup':>8} {'iguales':>8}")
+
+    for name, kb in networks:
+        rng = random.Random(seed)
+        stations = sorted(kb.all_nodes())
+        pairs = [(rng.choice(stations), rng.choice(stations)) for _ in range(queries)]
+        searchers = {search_type: RouteSearcher(kb, search_type=search_type)
+                     for search_type in ("dijkstra", "transfer")}
+        kb.adjacency()
+        graph = searchers["transfer"].transfer_graph()  # precálculo fuera de la medición
+        key_ratio = len(graph.key_stations) / len(stations)
+
+        results, base_ms = {}, None
+        for search_type, searcher in searchers.items():
+            expanded, elapsed, found = 0, 0.0, []
+            for origin, dest in pairs:
+                start_time = time.perf_counter()
+                result = searcher.find_best_route(origin, dest)
+                elapsed += time.perf_counter() - start_time
+                expanded += searcher.last_stats.expanded
+                found.append(None if result is None else round(result.total_time, 9))
+            results[search_type] = found
+            ms = elapsed / queries * 1000
+            base_ms = base_ms or ms
+            equal = found == results["dijkstra"]
+            print(f"{name:<15} {len(stations):>10} {key_ratio:>5.0%} {search_type:>9} "
+                  f"{expanded / queries:>12.0f} {ms:>12.2f} {base_ms / ms:>7.2f}x "
+                  f"{'✅' if equal else '❌':>7}")
+
+
+def bench_serialization(n_routes: int = 2000, repeats: int = 5):
+    """dataclasses.asdict + json.dumps frente a la serialización por tramos"""
+    kb = build_random_kb(2000, 150, 30, n_walks=200, seed=1)
+    searcher = RouteSearcher(kb, search_type="transfer")
+    rng = random.Random(1)
+    stations = sorted(kb.all_nodes())
+    routes = []
+    while len(routes) < n_routes:
+        origin, dest = rng.choice(stations), rng.choice(stations)
+        result = searcher.find_best_route(origin, dest)
+        if result is not None:
+            routes.append((origin, dest, result))
+
+    def baseline():
+        return [json.dumps(asdict(r)) for _, _, r in routes]
+
+    def legs_json():
+        return [route_to_json(r) for _, _, r in routes]
+
+    def legs_binary():
+        return [route_to_bytes(r) for _, _, r in routes]
+
+    def stream_jsonl():
+        with RouteStreamWriter(io.StringIO(), "jsonl") as writer:
+            for origin, dest, r in routes:
+                writer.write(origin, dest, r)
+        return [writer.stream.getvalue()]
+
+    def stream_binary():
+        with RouteStreamWriter(io.BytesIO(), "bin") as writer:
+            for origin, dest, r in routes:
+                writer.write(origin, dest, r)
+        return [writer.stream.getvalue()]
+
+    print("\n📦 BENCHMARK DE SERIALIZACIÓN")
+    print("=" * 66)
+    avg_stops = sum(len(r.path) for _, _, r in routes) / len(routes)
+    avg_legs = sum(len(r.legs) for _, _, r in routes) / len(routes)
+    print(f"{len(routes)} rutas - {avg_stops:.1f} paradas y {avg_legs:.1f} tramos de media")
+    print(f"{'método':<28} {'µs/ruta':>10} {'bytes/ruta':>11} {'speedup':>8}")
+    base_time = None
+    for name, func in (("asdict + json.dumps", baseline), ("route_to_json", legs_json),
+                       ("route_to_bytes", legs_binary), ("RouteStreamWriter jsonl", stream_jsonl),
+                       ("RouteStreamWriter bin", stream_binary)):
+        best = float('inf')
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            output = func()
+            best = min(best, time.perf_counter() - start_time)
+        size = sum(len(o.encode('utf-8') if isinstance(o, str) else o) for o in output)
+        base_time = base_time or best
+        print(f"{name:<28} {best / len(routes) * 1e6:>10.2f} {size / len(routes):>11.0f} "
+              f"{base_time / best:>7.2f}x")
+
+
+def _import_time_us(module: str) -> int:
+    """Tiempo acumulado de importación de module según python -X importtime"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=HERE, check=True)
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise RuntimeError(f"No se encontró {module} en la salida de -X importtime")
+
+
+def _wall_time(args, stdin: str = "") -> float:
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable] + args, input=stdin, capture_output=True, text=True,
+                   cwd=HERE, check=True)
+    return time.perf_counter() - start_time
+
+
+def bench_startup(runs: int = 10, queries: int = 1000):
+    """Importación del módulo y consultas por proceso frente al modo serve"""
+    print("\n🚀 BENCHMARK DE ARRANQUE")
+    print("=" * 66)
+    _import_time_us("sistema_rutas")  # calienta la caché de bytecode
+    imports = [_import_time_us("sistema_rutas") for _ in range(runs)]
+    print(f"import sistema_rutas (-X importtime): {statistics.median(imports) / 1000:.2f} ms")
+    empty = statistics.median(_wall_time(["-c", "pass"]) for _ in range(runs))
+    print(f"proceso python vacío:                 {empty * 1000:.2f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        network = os.path.join(tmp, "red.pkl")
+        subprocess.run([sys.executable, "-m", "sistema_rutas", "prebuild", network],
+                       capture_output=True, cwd=HERE, check=True)
+        serve = ["-m", "sistema_rutas", "serve", network]
+        single = statistics.median(_wall_time(serve, "Estacion_A,Estacion_J\n")
+                                   for _ in range(runs))
+        print(f"un proceso por consulta:              {single * 1000:.2f} ms/consulta")
+
+        rng = random.Random(0)
+        stations = [f"Estacion_{c}" for c in "ABCDEFGHIJK"]
+        lines = "".join(f"{rng.choice(stations)},{rng.choice(stations)}\n" for _ in range(queries))
+        total = _wall_time(serve, lines)
+        print(f"serve con {queries} consultas:          {total * 1000 / queries:.3f} ms/consulta "
+              f"({total * 1000:.1f} ms en total)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del sistema de rutas")
+    parser.add_argument("benchmark", nargs="?", default="delta",
+                        choices=["delta", "transbordos", "serializacion", "arranque"])
+    parser.add_argument("--aristas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Tamaños de red (aristas aproximadas)")
+    parser.add_argument("--consultas", type=int, default=None,
+                        help="Orígenes por tamaño (delta, 3) o pares por red (transbordos, 200)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=f"Procesos para el motor delta-stepping (CPUs: {os.cpu_count()})")
+    parser.add_argument("--rutas", type=int, default=2000, help="Rutas a serializar")
+
+    args = parser.parse_args()
+    if args.benchmark == "delta":
+        bench_one_to_all(args.aristas, args.consultas or 3, args.workers)
+    elif args.benchmark == "transbordos":
+        bench_transfer(args.consultas or 200)
+    elif args.benchmark == "serializacion":
+        bench_serialization(args.rutas)
+    else:
+        bench_startup()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Motor delta-stepping para consultas de un origen a todas las estaciones.
+
+Trabaja sobre la misma red expandida por líneas que RouteSearcher: cada estado
+es un par (estación, última línea en la que se viajó) y la regla de transbordo
+es sistema_rutas.transition. Los estados se agrupan en cubetas de ancho delta según su
+tiempo tentativo y cada cubeta se procesa como una frontera completa:
+  - con NumPy, las aristas de toda la frontera se relajan en lote;
+  - con workers > 1, la frontera se reparte entre procesos que leen el grafo
+    y las distancias desde memoria compartida;
+  - sin NumPy, se usa la misma estrategia de cubetas en Python puro.
+"""
+
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sistema_rutas import KnowledgeBase, transition
+
+try:
+    import numpy as np
+    from multiprocessing import shared_memory
+    HAS_NUMPY = True
+except ImportError:  # NumPy es opcional
+    np = None
+    HAS_NUMPY = False
+
+
+class DeltaSteppingEngine:
+    """
+    Preprocesa la red expandida por líneas en formato CSR y resuelve
+    consultas de un origen a todos los destinos con delta-stepping.
+    """
+    # Fronteras más pequeñas que esto se relajan en el proceso principal
+    PARALLEL_THRESHOLD = 4096
+
+    def __init__(self, kb: KnowledgeBase, transfer_penalty: float = 4.0,
+                 delta: Optional[float] = None, workers: int = 1,
+                 use_numpy: Optional[bool] = None):
+        """
+        delta: ancho de cubeta en minutos, mayor que 0 (None = tiempo medio de
+               las conexiones, o 1.0 si todas duran 0)
+        workers: procesos para relajar fronteras grandes (requiere NumPy)
+        use_numpy: forzar o desactivar NumPy (None = usarlo si está instalado)
+        """
+        if use_numpy is None:
+            use_numpy = HAS_NUMPY
+        if use_numpy and not HAS_NUMPY:
+            raise ImportError("NumPy no está instalado; use use_numpy=False")
+        if workers > 1 and not use_numpy:
+            raise ValueError("workers > 1 requiere NumPy")
+        if delta is not None and not delta > 0:
+            raise ValueError(f"delta debe ser mayor que 0: {delta}")
+        self.kb = kb
+        self.transfer_penalty = transfer_penalty
+        self.use_numpy = use_numpy
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._shm: List["shared_memory.SharedMemory"] = []
+        # Liberan procesos y memoria compartida aunque no se llame a close()
+        self._pool_finalizer: Optional[weakref.finalize] = None
+        self._shm_finalizer: Optional[weakref.finalize] = None
+        self._build_state_graph()
+        if delta is None:
+            delta = sum(e.time for e in kb.edges) / len(kb.edges) if kb.edges else 0.0
+            # Con conexiones de 0 minutos la media no sirve como ancho de cubeta
+            if not delta > 0:
+                delta = 1.0
+        self.delta = delta
+
+    def _build_state_graph(self):
+        """
+        Construye el grafo de estados (nodo, linea) en formato CSR.
+        Incluye un estado (nodo, None) por estación, que hace de origen de
+        las consultas; los estados alcanzables caminando se añaden por cierre.
+        """
+        adjacency = self.kb.adjacency()
+        state_index: Dict[Tuple[str, Optional[str]], int] = {}
+        states: List[Tuple[str, Optional[str]]] = []
+
+        def index_of(state):
+            if state not in state_index:
+                state_index[state] = len(states)
+                states.append(state)
+            return state_index[state]
+
+        for node in sorted(self.kb.all_nodes()):
+            index_of((node, None))
+
+        indptr = [0]
+        targets: List[int] = []
+        weights: List[float] = []
+        # states crece mientras se recorre: los estados nuevos se procesan después
+        i = 0
+        while i < len(states):
+            node, line = states[i]
+            for edge in adjacency.get(node, ()):
+                next_line, penalty, _ = transition(line, edge, self.transfer_penalty)
+                targets.append(index_of((edge.dest, next_line)))
+                weights.append(edge.time + penalty)
+            indptr.append(len(targets))
+            i += 1
+
+        self.states = states
+        self.state_index = state_index
+        if self.use_numpy:
+            self.indptr = np.asarray(indptr, dtype=np.int64)
+            self.targets = np.asarray(targets, dtype=np.int64)
+            self.weights = np.asarray(weights, dtype=np.float64)
+            # estado -> índice de estación, para reducir a tiempos por estación
+            self.station_names = sorted({node for node, _ in states})
+            station_id = {name: i for i, name in enumerate(self.station_names)}
+            self.state_station = np.asarray([station_id[node] for node, _ in states],
+                                            dtype=np.int64)
+        else:
+            self.indptr = indptr
+            self.targets = targets
+            self.weights = weights
+
+    def one_to_all(self, start: str) -> Dict[str, float]:
+        """
+        Tiempo mínimo desde start a cada estación alcanzable; mismo resultado
+        que RouteSearcher.one_to_all con la misma transfer_penalty.
+        """
+        source = self.state_index.get((start, None))
+        if source is None:
+            return {start: 0.0}
+        if self.use_numpy:
+            return self._run_numpy(source)
+        return self._run_python(source)
+
+    def _run_python(self, source: int) -> Dict[str, float]:
+        indptr, targets, weights, delta = self.indptr, self.targets, self.weights, self.delta
+        inf = float('inf')
+        dist = [inf] * len(self.states)
+        dist[source] = 0.0
+        buckets: Dict[int, set] = {0: {source}}
+
+        while buckets:
+            current = min(buckets)
+            frontier = {v for v in buckets.pop(current) if int(dist[v] / delta) == current}
+            while frontier:
+                # Relajar toda la frontera antes de aplicar las mejoras
+                improved: Dict[int, float] = {}
+                for u in frontier:
+                    du = dist[u]
+                    for k in range(indptr[u], indptr[u + 1]):
+                        v = targets[k]
+                        d = du + weights[k]
+                        if d < dist[v] and d < improved.get(v, inf):
+                            improved[v] = d
+                frontier = set()
+                for v, d in improved.items():
+                    dist[v] = d
+                    b = int(d / delta)
+                    if b == current:
+                        frontier.add(v)
+                    else:
+                        # La entrada antigua de v queda obsoleta y se filtra al sacar su cubeta
+                        buckets.setdefault(b, set()).add(v)
+
+        station_time: Dict[str, float] = {}
+        for (node, _), d in zip(self.states, dist):
+            if d < station_time.get(node, inf):
+                station_time[node] = d
+        return station_time
+
+    def _run_numpy(self, source: int) -> Dict[str, float]:
+        n = len(self.states)
+        if self.workers > 1:
+            dist = self._shared_dist(n)
+        else:
+            dist = np.full(n, np.inf)
+        dist[source] = 0.0
+        settled = np.zeros(n, dtype=bool)
+
+        while True:
+            pending = ~settled & np.isfinite(dist)
+            if not pending.any():
+                break
+            upper = (np.floor(dist[pending].min() / self.delta) + 1) * self.delta
+            frontier = np.flatnonzero(pending & (dist < upper))
+            while frontier.size:
+                settled[frontier] = True
+                tgt, cand = self._relax(frontier, dist)
+                better = cand < dist[tgt]
+                tgt, cand = tgt[better], cand[better]
+                dist[tgt] = cand
+                settled[tgt] = False
+                frontier = tgt[cand < upper]
+
+        per_station = np.full(len(self.station_names), np.inf)
+        np.minimum.at(per_station, self.state_station, dist)
+        reachable = np.flatnonzero(np.isfinite(per_station))
+        return {self.station_names[i]: float(per_station[i]) for i in reachable}
+
+    def _relax(self, frontier, dist):
+        """Candidatos (destino, tiempo) mínimos por destino para una frontera."""
+        if self.workers > 1 and frontier.size >= self.PARALLEL_THRESHOLD:
+            chunks = np.array_split(frontier, self.workers)
+            parts = list(self._get_pool().map(_relax_chunk, chunks))
+            return _min_per_target(np.concatenate([p[0] for p in parts]),
+                                   np.concatenate([p[1] for p in parts]))
+        return _relax_arrays(self.indptr, self.targets, self.weights, dist, frontier)
+
+    # --- memoria compartida -------------------------------------------------
+
+    def _shared_dist(self, n: int):
+        if not self._shm:
+            self._shared_arrays = {}
+            specs = {}
+            for name, array in (("indptr", self.indptr), ("targets", self.targets),
+                                ("weights", self.weights),
+                                ("dist", np.empty(n, dtype=np.float64))):
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+                view[:] = array
+                self._shm.append(shm)
+                self._shared_arrays[name] = view
+                specs[name] = (shm.name, array.shape, array.dtype.str)
+            self._shared_specs = specs
+            self._shm_finalizer = weakref.finalize(self, _release_segments, self._shm)
+        dist = self._shared_arrays["dist"]
+        dist.fill(np.inf)
+        return dist
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             initializer=_attach_worker,
+                                             initargs=(self._shared_specs,))
+            self._pool_finalizer = weakref.finalize(self, self._pool.shutdown)
+        return self._pool
+
+    def close(self):
+        """Libera procesos y memoria compartida (también ocurre al recolectar el motor)."""
+        if self._pool is not None:
+            self._pool_finalizer()
+            self._pool = None
+        if self._shm:
+            self._shm_finalizer()
+            self._shm = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _release_segments(segments):
+    """Cierra y elimina los segmentos de memoria compartida de un motor."""
+    for shm in segments:
+        shm.close()
+        shm.unlink()
+    segments.clear()
+
+
+def _relax_arrays(indptr, targets, weights, dist, frontier):
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    # Índices de arista de toda la frontera sin bucles de Python
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+    cand = np.repeat(dist[frontier], counts) + weights[offsets]
+    return _min_per_target(targets[offsets], cand)
+
+
+def _min_per_target(tgt, cand):
+    order = np.lexsort((cand, tgt))
+    tgt, cand = tgt[order], cand[order]
+    first = np.ones(tgt.size, dtype=bool)
+    first[1:] = tgt[1:] != tgt[:-1]
+    return tgt[first], cand[first]
+
+
+# Estado de cada proceso worker: vistas sobre la memoria compartida
+_worker_arrays: Dict[str, object] = {}
+_worker_shm: List[object] = []
+
+
+def _attach_worker(specs):
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker_shm.append(shm)
+        _worker_arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _relax_chunk(frontier):
+    a = _worker_arrays
+    return _relax_arrays(a["indptr"], a["targets"], a["weights"], a["dist"], frontier)
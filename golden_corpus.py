@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Corpus de rutas de referencia y pruebas diferenciales entre motores.
+
+generate_corpus crea redes aleatorias reproducibles (más la red de ejemplo)
+con sus consultas y guarda los resultados del Dijkstra de referencia. Además
+de las redes bidireccionales con tiempos reales hay variantes con líneas de
+un solo sentido, líneas circulares y minutos enteros (rutas empatadas), y
+consultas con max_stops. Las redes fijas (FIXED_NETWORKS) son pequeñas y
+se consultan entre todos los pares con varios límites de paradas: en ellas
+la ruta más rápida a un estado (estación, línea) usa demasiadas paradas y
+solo cabe una más lenta, así que un motor que descarte etiquetas solo por
+tiempo falla. La red grande ("large") solo se recorre desde
+'python golden_corpus.py verificar', no desde pruebas.py.
+run_differential ejecuta todos los motores, en frío (índices y
+precálculos descartados antes de empezar) y en caliente, sobre el corpus,
+compara total_time, transfers, total_cost y total_distance y mide el tiempo
+de cada motor en la misma ejecución.
+"""
+
+import json
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from sistema_rutas import KnowledgeBase, RouteSearcher, build_random_kb, build_sample_kb
+
+CORPUS_VERSION = 2
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "corpus_golden.json")
+METRICS = ("total_time", "transfers", "total_cost", "total_distance")
+# Variantes de red generadas además de las bidireccionales con tiempos reales
+VARIANTS = (
+    {"integer_times": True},
+    {"one_way": 0.5, "circular": 0.3, "integer_times": True},
+)
+# Redes fijas como aristas [origen, destino, línea, minutos, distancia, costo, bidireccional]
+FIXED_NETWORKS = (
+    # A → B por Línea_1 en dos tramos (2 min, 2 paradas) o directo (10 min, 1 parada)
+    [["Estacion_A", "Estacion_X", "Línea_1", 1, 1.0, 1.0, True],
+     ["Estacion_X", "Estacion_B", "Línea_1", 1, 1.0, 1.0, True],
+     ["Estacion_A", "Estacion_B", "Línea_1", 10, 1.0, 1.0, True],
+     ["Estacion_B", "Estacion_Y", "Línea_1", 1, 1.0, 1.0, True],
+     ["Estacion_Y", "Estacion_G", "Línea_1", 1, 1.0, 1.0, True],
+     ["Estacion_Y", "Estacion_H", "Línea_2", 3, 1.0, 1.0, True]],
+    # Líneas cruzadas, una circular de un solo sentido (caso encontrado por fuzzing)
+    [["Estacion_2", "Estacion_3", "Línea_0", 6, 1.0, 1.0, False],
+     ["Estacion_3", "Estacion_4", "Línea_0", 5, 1.0, 1.0, False],
+     ["Estacion_4", "Estacion_8", "Línea_0", 5, 1.0, 1.0, False],
+     ["Estacion_8", "Estacion_5", "Línea_0", 3, 1.0, 1.0, False],
+     ["Estacion_5", "Estacion_7", "Línea_0", 6, 1.0, 1.0, False],
+     ["Estacion_7", "Estacion_2", "Línea_0", 5, 1.0, 1.0, False],
+     ["Estacion_7", "Estacion_4", "Línea_1", 1, 1.0, 1.0, True],
+     ["Estacion_4", "Estacion_1", "Línea_1", 6, 1.0, 1.0, True],
+     ["Estacion_1", "Estacion_2", "Línea_1", 5, 1.0, 1.0, True],
+     ["Estacion_2", "Estacion_3", "Línea_1", 6, 1.0, 1.0, True],
+     ["Estacion_4", "Estacion_5", "Línea_2", 2, 1.0, 1.0, True],
+     ["Estacion_5", "Estacion_3", "Línea_2", 1, 1.0, 1.0, True],
+     ["Estacion_3", "Estacion_0", "Línea_2", 6, 1.0, 1.0, True],
+     ["Estacion_0", "Estacion_6", "Línea_2", 3, 1.0, 1.0, True]],
+)
+# Límites de paradas con los que se consulta cada par de las redes fijas
+FIXED_STOP_LIMITS = (None, 1, 2, 3, 4, 5)
+
+
+def build_network(params: Dict) -> KnowledgeBase:
+    """Reconstruye la red descrita por los parámetros guardados en el corpus"""
+    if params["builder"] == "sample":
+        return build_sample_kb()
+    if params["builder"] == "edges":
+        kb = KnowledgeBase()
+        for origin, dest, line, minutes, distance, cost, bidirectional in params["edges"]:
+            kb.add_connection(origin, dest, line, minutes, distance, cost, bidirectional)
+        return kb
+    return build_random_kb(params["n_stations"], params["n_lines"], params["stops_per_line"],
+                           n_walks=params["n_walks"], seed=params["seed"],
+                           one_way=params.get("one_way", 0.0),
+                           circular=params.get("circular", 0.0),
+                           integer_times=params.get("integer_times", False))
+
+
+def fingerprint(kb: KnowledgeBase) -> Dict:
+    """Huella de la red para detectar que el generador ya no la reproduce"""
+    return {"edges": len(kb.edges), "time_sum": round(sum(e.time for e in kb.edges), 6)}
+
+
+def generate_corpus(n_networks: int = 3, n_stations: int = 300, n_lines: int = 30,
+                    stops_per_line: int = 15, n_walks: int = 40, n_queries: int = 100,
+                    transfer_penalty: float = 4.0, seed: int = 0,
+                    large_stations: int = 3000) -> Dict:
+    """
+    Genera redes y consultas y guarda los resultados del Dijkstra de referencia.
+    Cada consulta es [origen, destino, max_stops o None, resultado o None].
+    large_stations: estaciones de la red grande (0 = sin red grande)
+    """
+    rng = random.Random(seed)
+    network_params: List[Dict] = [{"builder": "sample"}]
+    network_params += [{"builder": "edges", "edges": edges} for edges in FIXED_NETWORKS]
+    base = {"builder": "random", "n_stations": n_stations, "n_lines": n_lines,
+            "stops_per_line": stops_per_line, "n_walks": n_walks}
+    for i in range(n_networks):
+        network_params.append(dict(base, seed=seed * 1000 + i))
+    for i, variant in enumerate(VARIANTS):
+        network_params.append(dict(base, seed=seed * 1000 + n_networks + i, **variant))
+    if large_stations:
+        network_params.append({"builder": "random", "n_stations": large_stations,
+                               "n_lines": large_stations // 10, "stops_per_line": 30,
+                               "n_walks": large_stations // 8,
+                               "seed": seed * 1000 + n_networks + len(VARIANTS),
+                               "one_way": 0.2, "circular": 0.2, "integer_times": True,
+                               "large": True})
+
+    networks = []
+    for params in network_params:
+        kb = build_network(params)
+        stations = sorted(kb.all_nodes())
+        if params["builder"] == "sample":
+            pairs = [(a, b, None) for a in stations for b in stations]
+        elif params["builder"] == "edges":
+            pairs = [(a, b, limit) for a in stations for b in stations
+                     for limit in FIXED_STOP_LIMITS]
+        else:
+            pairs = [(rng.choice(stations), rng.choice(stations), None) for _ in range(n_queries)]
+            # Límites de paradas cortos, para que a veces corten la mejor ruta
+            pairs += [(rng.choice(stations), rng.choice(stations), rng.randint(2, 12))
+                      for _ in range(n_queries // 4)]
+        pairs.append((stations[0], "Estacion_Z", None))  # destino inexistente
+
+        reference = RouteSearcher(kb, transfer_penalty=transfer_penalty, search_type="dijkstra")
+        queries = []
+        for start, goal, max_stops in pairs:
+            result = reference.find_best_route(start, goal, max_stops)
+            golden = None if result is None else {m: getattr(result, m) for m in METRICS}
+            queries.append([start, goal, max_stops, golden])
+        networks.append({"params": params, "fingerprint": fingerprint(kb), "queries": queries})
+
+    return {"version": CORPUS_VERSION, "transfer_penalty": transfer_penalty, "networks": networks}
+
+
+def save_corpus(corpus: Dict, filename: str = DEFAULT_CORPUS):
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(corpus, file, ensure_ascii=False, indent=1)
+
+
+def load_corpus(filename: str = DEFAULT_CORPUS) -> Dict:
+    with open(filename, 'r', encoding='utf-8') as file:
+        corpus = json.load(file)
+    if corpus.get("version") != CORPUS_VERSION:
+        raise ValueError(f"Versión de corpus no soportada: {corpus.get('version')}")
+    return corpus
+
+
+def _searcher_engine(search_type: str):
+    def factory(kb: KnowledgeBase, transfer_penalty: float):
+        searcher = RouteSearcher(kb, transfer_penalty=transfer_penalty, search_type=search_type)
+
+        def query(start: str, goal: str, max_stops: Optional[int] = None) -> Optional[Dict]:
+            result = searcher.find_best_route(start, goal, max_stops)
+            return None if result is None else {m: getattr(result, m) for m in METRICS}
+        return query
+    return factory
+
+
+def _delta_engine(kb: KnowledgeBase, transfer_penalty: float):
+    """
+    Delta-stepping solo calcula tiempos: el resto de métricas no se compara
+    y las consultas con max_stops no se le aplican (ver HOP_LIMITED)
+    """
+    from delta_stepping import DeltaSteppingEngine
+    engine = DeltaSteppingEngine(kb, transfer_penalty=transfer_penalty)
+    cache: Dict[str, Dict[str, float]] = {}
+
+    def query(start: str, goal: str, max_stops: Optional[int] = None) -> Optional[Dict]:
+        if start not in cache:
+            cache[start] = engine.one_to_all(start)
+        total_time = cache[start].get(goal)
+        return None if total_time is None else {"total_time": total_time}
+    return query
+
+
+# nombre -> fábrica(kb, transfer_penalty) -> consulta(origen, destino, max_stops)
+ENGINES: Dict[str, Callable] = {
+    "dijkstra": _searcher_engine("dijkstra"),
+    "astar": _searcher_engine("astar"),
+    "transfer": _searcher_engine("transfer"),
+    "delta": _delta_engine,
+}
+# Motores que respetan max_stops; los demás se saltan esas consultas
+HOP_LIMITED = {"dijkstra", "astar", "transfer"}
+
+
+def run_differential(corpus: Dict, engines: Optional[List[str]] = None,
+                     tolerance: float = 1e-6, include_large: bool = True) -> Dict[str, Dict]:
+    """
+    Ejecuta cada motor sobre el corpus en frío y en caliente.
+    include_large: recorrer también las redes marcadas como grandes
+    Devuelve motor -> {"queries", "seconds", "mismatches": [(red, origen, destino, detalle)]}.
+    """
+    engines = engines or list(ENGINES)
+    penalty = corpus["transfer_penalty"]
+    report = {f"{name} ({mode})": {"queries": 0, "seconds": 0.0, "mismatches": []}
+              for name in engines for mode in ("frío", "caliente")}
+
+    for net_id, network in enumerate(corpus["networks"]):
+        if network["params"].get("large") and not include_large:
+            continue
+        kb = build_network(network["params"])
+        if fingerprint(kb) != network["fingerprint"]:
+            raise ValueError(f"La red {net_id} ya no coincide con el corpus; regenérelo")
+
+        for name in engines:
+            kb.invalidate_indexes()
+            # Frío: la fábrica y los índices se construyen dentro de la medición
+            start_time = time.perf_counter()
+            query = ENGINES[name](kb, penalty)
+            for mode in ("frío", "caliente"):
+                entry = report[f"{name} ({mode})"]
+                if mode == "caliente":
+                    start_time = time.perf_counter()
+                for start, goal, max_stops, golden in network["queries"]:
+                    if max_stops is not None and name not in HOP_LIMITED:
+                        continue
+                    obtained = query(start, goal, max_stops)
+                    entry["queries"] += 1
+                    detail = _compare(golden, obtained, tolerance)
+                    if detail:
+                        entry["mismatches"].append((net_id, start, goal, detail))
+                entry["seconds"] += time.perf_counter() - start_time
+    return report
+
+
+def _compare(golden: Optional[Dict], obtained: Optional[Dict], tolerance: float) -> Optional[str]:
+    if golden is None or obtained is None:
+        if golden is obtained:
+            return None
+        return f"referencia {golden} != obtenido {obtained}"
+    for metric, value in obtained.items():
+        if abs(golden[metric] - value) > tolerance:
+            return f"{metric}: referencia {golden[metric]} != obtenido {value}"
+    return None
+
+
+def print_report(report: Dict[str, Dict]):
+    print("\n🔬 PRUEBAS DIFERENCIALES")
+    print("=" * 66)
+    print(f"{'motor':<22} {'consultas':>9} {'ms/consulta':>12} {'discrepancias':>14}")
+    for name, entry in report.items():
+        per_query = entry["seconds"] / entry["queries"] * 1000 if entry["queries"] else 0.0
+        print(f"{name:<22} {entry['queries']:>9} {per_query:>12.3f} {len(entry['mismatches']):>14}")
+    for name, entry in report.items():
+        for net_id, start, goal, detail in entry["mismatches"][:5]:
+            print(f"❌ {name} red {net_id}: {start} → {goal}: {detail}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Corpus de rutas de referencia")
+    parser.add_argument("accion", choices=["generar", "verificar"])
+    parser.add_argument("--archivo", default=DEFAULT_CORPUS)
+    parser.add_argument("--redes", type=int, default=3, help="Redes aleatorias a generar")
+    parser.add_argument("--estaciones", type=int, default=300)
+    parser.add_argument("--estaciones-grande", type=int, default=3000,
+                        help="Estaciones de la red grande (0 = sin red grande)")
+    parser.add_argument("--consultas", type=int, default=100, help="Consultas por red")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--motores", nargs="+", choices=list(ENGINES), help="Motores a verificar")
+
+    args = parser.parse_args()
+
+    if args.accion == "generar":
+        corpus = generate_corpus(n_networks=args.redes, n_stations=args.estaciones,
+                                 n_lines=max(1, args.estaciones // 10),
+                                 n_walks=max(1, args.estaciones // 8),
+                                 n_queries=args.consultas, seed=args.semilla,
+                                 large_stations=args.estaciones_grande)
+        save_corpus(corpus, args.archivo)
+        total = sum(len(n["queries"]) for n in corpus["networks"])
+        print(f"✅ Corpus guardado en {args.archivo}: {len(corpus['networks'])} redes, "
+              f"{total} consultas")
+    else:
+        report = run_differential(load_corpus(args.archivo), args.motores)
+        print_report(report)
+        if any(entry["mismatches"] for entry in report.values()):
+            raise SystemExit(1)
@@ -6,7 +6,11 @@ Incluye casos de prueba exhaustivos y análisis de rendimiento
 
 import time
 import sys
-from sistema_rutas import KnowledgeBase, RouteSearcher, build_sample_kb, pretty_print_result
+from sistema_rutas import (Edge, KnowledgeBase, RouteSearcher, RouteStreamWriter, batch_mode,
+                           build_sample_kb, build_random_kb, load_kb_from_csv, load_network,
+                           prebuild_network, pretty_print_result, read_route_stream,
+                           route_from_bytes, route_to_bytes, route_to_json, save_network,
+                           transition)
 
 class TestSuite:
     """Suite de pruebas para el sistema de rutas"""
@@ -137,6 +141,333 @@ class TestSuite:
         print("✅ Correctamente no encuentra ruta inexistente")
         return True
     
+    def test_destino_inalcanzable(self):
+        """Prueba: Destino en otra componente se descarta sin explorar"""
+        kb = build_sample_kb()
+        kb.add_connection("Estacion_X", "Estacion_Y", "Línea_X", 5)
+        searcher = RouteSearcher(kb, search_type="dijkstra")
+        result = searcher.find_best_route("Estacion_A", "Estacion_Y")
+        
+        if result is not None:
+            print("❌ Se encontró ruta entre componentes desconectadas")
+            return False
+        
+        if searcher.last_stats.status != "unreachable" or searcher.last_stats.expanded != 0:
+            print(f"❌ Estado inesperado: {searcher.last_stats}")
+            return False
+        
+        # La componente nueva sigue siendo navegable
+        if searcher.find_best_route("Estacion_X", "Estacion_Y") is None:
+            print("❌ No se encontró ruta dentro de la componente nueva")
+            return False
+        
+        print("✅ Destino inalcanzable detectado sin expandir estados")
+        return True
+    
+    def test_presupuesto_busqueda(self):
+        """Prueba: Límites de expansiones y de tiempo"""
+        searcher = RouteSearcher(self.kb, search_type="dijkstra", max_expansions=2)
+        result = searcher.find_best_route("Estacion_A", "Estacion_J")
+        
+        if result is not None or searcher.last_stats.status != "expansion_limit":
+            print(f"❌ No se respetó max_expansions: {searcher.last_stats}")
+            return False
+        
+        if searcher.last_stats.expanded > 2:
+            print(f"❌ Se expandieron {searcher.last_stats.expanded} estados (máximo 2)")
+            return False
+        
+        # El límite por consulta sustituye al del buscador
+        result = searcher.find_best_route("Estacion_A", "Estacion_J", max_expansions=10000)
+        if result is None or searcher.last_stats.status != "found":
+            print("❌ El límite por consulta no sustituye al del buscador")
+            return False
+        
+        result = searcher.find_best_route("Estacion_A", "Estacion_J", time_limit=0.0)
+        if result is not None or searcher.last_stats.status != "time_limit":
+            print(f"❌ No se respetó time_limit: {searcher.last_stats}")
+            return False
+        
+        print("✅ Presupuestos de búsqueda respetados")
+        return True
+    
+    def test_delta_stepping(self):
+        """Prueba: Delta-stepping da los mismos tiempos por estación que Dijkstra"""
+        from delta_stepping import DeltaSteppingEngine, HAS_NUMPY
+        
+        modes = [False, True] if HAS_NUMPY else [False]
+        for kb, origins in ((self.kb, sorted(self.kb.all_nodes())),
+                            (build_random_kb(300, 30, 15, n_walks=40, seed=7),
+                             ["Estacion_0", "Estacion_1", "Estacion_2"])):
+            reference = RouteSearcher(kb)
+            for use_numpy in modes:
+                engine = DeltaSteppingEngine(kb, use_numpy=use_numpy, delta=3.0)
+                for origin in origins:
+                    expected = reference.one_to_all(origin)
+                    obtained = engine.one_to_all(origin)
+                    if expected.keys() != obtained.keys() or any(
+                            abs(expected[s] - obtained[s]) > 1e-9 for s in expected):
+                        print(f"❌ Tiempos distintos desde {origin} (NumPy: {use_numpy})")
+                        return False
+        
+        # Conexiones de 0 minutos: el ancho de cubeta por defecto debe ser positivo
+        kb = KnowledgeBase()
+        kb.add_connection("Estacion_X", "Estacion_Y", "Línea_1", 0)
+        kb.add_connection("Estacion_Y", "Estacion_Z", "Línea_2", 0)
+        for use_numpy in modes:
+            engine = DeltaSteppingEngine(kb, transfer_penalty=0.0, use_numpy=use_numpy)
+            if engine.delta <= 0 or engine.one_to_all("Estacion_X") != RouteSearcher(
+                    kb, transfer_penalty=0.0).one_to_all("Estacion_X"):
+                print(f"❌ Red con tiempos 0 mal resuelta (NumPy: {use_numpy})")
+                return False
+        try:
+            DeltaSteppingEngine(kb, delta=0)
+            print("❌ delta=0 debería rechazarse")
+            return False
+        except ValueError:
+            pass
+        
+        print(f"✅ Tiempos idénticos a Dijkstra (NumPy: {'sí' if HAS_NUMPY else 'no'})")
+        return True
+    
+    def test_transbordos_a_pie(self):
+        """Prueba: Caminar entre líneas cuenta un solo transbordo"""
+        kb = KnowledgeBase()
+        kb.add_connection("Estacion_X", "Estacion_Y", "Línea_1", 5)
+        kb.add_connection("Estacion_Y", "Estacion_Z", "Transferencia_9", 3)
+        kb.add_connection("Estacion_Z", "Estacion_W", "Línea_2", 6)
+        
+        for search_type in ("dijkstra", "astar", "transfer"):
+            searcher = RouteSearcher(kb, transfer_penalty=4.0, search_type=search_type)
+            result = searcher.find_best_route("Estacion_X", "Estacion_W")
+            if result is None or result.transfers != 1 or result.total_time != 18:
+                print(f"❌ {search_type}: se esperaba 1 transbordo y 18 min, resultado: {result}")
+                return False
+        
+        # Empate de tiempo entre subir a una línea y caminar: gana el de menos
+        # transbordos en todos los motores (y la cola no compara None con str)
+        kb = KnowledgeBase()
+        kb.add_connection("Estacion_S", "Estacion_Y", "Línea_1", 5)
+        kb.add_connection("Estacion_S", "Estacion_Y", "Transferencia_1", 5)
+        kb.add_connection("Estacion_Y", "Estacion_G", "Línea_2", 3)
+        for search_type in ("dijkstra", "astar", "transfer"):
+            searcher = RouteSearcher(kb, transfer_penalty=0.0, search_type=search_type)
+            result = searcher.find_best_route("Estacion_S", "Estacion_G")
+            if result is None or result.transfers != 0 or result.total_time != 8:
+                print(f"❌ {search_type}: se esperaba 0 transbordos y 8 min, resultado: {result}")
+                return False
+        
+        # Cualquier conexión a pie lleva al mismo estado tras haber viajado
+        walks = [Edge("Estacion_Y", "Estacion_Z", f"Transferencia_{i}", 3) for i in (1, 2)]
+        if len({transition("Línea_1", walk, 4.0) for walk in walks}) != 1:
+            print("❌ Cada conexión a pie crea un estado distinto")
+            return False
+        
+        print("✅ Un transbordo real por cambio de línea (caminar no suma)")
+        return True
+    
+    def test_grafo_transbordos(self):
+        """Prueba: El grafo de transbordos da las mismas rutas que Dijkstra"""
+        for kb in (self.kb, build_random_kb(200, 20, 12, n_walks=30, seed=3)):
+            reference = RouteSearcher(kb, search_type="dijkstra")
+            transfer = RouteSearcher(kb, search_type="transfer")
+            stations = sorted(kb.all_nodes())[:40]
+            for start in stations:
+                for goal in stations:
+                    expected = reference.find_best_route(start, goal)
+                    obtained = transfer.find_best_route(start, goal)
+                    if (expected is None) != (obtained is None):
+                        print(f"❌ {start} → {goal}: solo un motor encontró ruta")
+                        return False
+                    if expected is None:
+                        continue
+                    if (abs(expected.total_time - obtained.total_time) > 1e-9
+                            or expected.transfers != obtained.transfers
+                            or abs(expected.total_cost - obtained.total_cost) > 1e-9
+                            or abs(expected.total_distance - obtained.total_distance) > 1e-9):
+                        print(f"❌ {start} → {goal}: {expected} != {obtained}")
+                        return False
+                    if obtained.path[0] != (start, None) or obtained.path[-1][0] != goal:
+                        print(f"❌ {start} → {goal}: ruta mal reconstruida")
+                        return False
+
+        # Un tramo exprés no puede saltarse el límite de paradas
+        kb = KnowledgeBase()
+        for i in range(10):
+            kb.add_connection(f"Estacion_{i}", f"Estacion_{i + 1}", "Línea_1", 2)
+        for max_stops in (3, 9, 10):
+            expected = RouteSearcher(kb, search_type="dijkstra").find_best_route(
+                "Estacion_0", "Estacion_10", max_stops=max_stops)
+            obtained = RouteSearcher(kb, search_type="transfer").find_best_route(
+                "Estacion_0", "Estacion_10", max_stops=max_stops)
+            if (expected is None) != (obtained is None):
+                print(f"❌ max_stops={max_stops}: los motores no coinciden")
+                return False
+
+        # Una ruta más rápida pero con demasiadas paradas no debe ocultar la que cabe
+        kb = KnowledgeBase()
+        for origin, dest in (("A", "X"), ("X", "B"), ("B", "Y"), ("Y", "G")):
+            kb.add_connection(f"Estacion_{origin}", f"Estacion_{dest}", "Línea_1", 1)
+        kb.add_connection("Estacion_A", "Estacion_B", "Línea_1", 10)
+        for max_stops, expected_time in ((None, 4), (3, 12), (2, None)):
+            for search_type in ("dijkstra", "astar", "transfer"):
+                result = RouteSearcher(kb, search_type=search_type).find_best_route(
+                    "Estacion_A", "Estacion_G", max_stops=max_stops)
+                obtained_time = None if result is None else result.total_time
+                if obtained_time != expected_time:
+                    print(f"❌ {search_type} con max_stops={max_stops}: "
+                          f"se esperaba {expected_time} min, resultado: {obtained_time}")
+                    return False
+
+        graph = RouteSearcher(self.kb, search_type="transfer").transfer_graph()
+        print(f"✅ Rutas idénticas con {len(graph.key_stations)} estaciones clave "
+              f"de {len(graph.station_lines)}")
+        return True
+    
+    def test_corpus_golden(self):
+        """Prueba: Todos los motores reproducen el corpus de rutas de referencia"""
+        from golden_corpus import load_corpus, run_differential
+        
+        # La red grande queda para 'python golden_corpus.py verificar'
+        report = run_differential(load_corpus(), include_large=False)
+        failed = False
+        for name, entry in report.items():
+            for net_id, start, goal, detail in entry["mismatches"][:3]:
+                print(f"❌ {name} red {net_id}: {start} → {goal}: {detail}")
+                failed = True
+        if failed:
+            return False
+        
+        queries = sum(entry["queries"] for entry in report.values())
+        print(f"✅ {queries} consultas sin discrepancias en {len(report)} motores")
+        return True
+    
+    def test_tramos_y_serializacion(self):
+        """Prueba: Tramos por línea y serialización JSON/binaria"""
+        import io
+        import json
+        
+        searcher = RouteSearcher(self.kb, search_type="astar")
+        result = searcher.find_best_route("Estacion_A", "Estacion_J")
+        
+        # Los tramos recorren la ruta completa, uno por línea
+        legs = [(leg.line, leg.board, leg.alight, leg.stops) for leg in result.legs]
+        expected = [("Línea_A", "Estacion_A", "Estacion_C", 2), ("Línea_C", "Estacion_C", "Estacion_J", 2)]
+        if legs != expected:
+            print(f"❌ Tramos esperados: {expected}, obtenidos: {legs}")
+            return False
+        if sum(leg.stops for leg in result.legs) != len(result.path) - 1:
+            print("❌ Los tramos no cubren todas las paradas")
+            return False
+        
+        data = json.loads(route_to_json(result))
+        if data["total_time"] != result.total_time or len(data["legs"]) != len(result.legs):
+            print(f"❌ JSON incorrecto: {data}")
+            return False
+        
+        decoded = route_from_bytes(route_to_bytes(result))
+        if decoded.legs != result.legs or decoded.transfers != result.transfers:
+            print(f"❌ Binario incorrecto: {decoded}")
+            return False
+        
+        # Origen igual al destino: sin tramos, pero la estación no se pierde
+        same = searcher.find_best_route("Estacion_A", "Estacion_A")
+        if route_from_bytes(route_to_bytes(same)).path != [("Estacion_A", None)]:
+            print("❌ Ruta sin tramos mal decodificada")
+            return False
+        
+        # Las conexiones de ejemplo usan minutos enteros; los tramos, float
+        if not all(isinstance(leg.time, float) for leg in result.legs):
+            print(f"❌ Minutos de tramo no float: {result.legs}")
+            return False
+        
+        stream = io.BytesIO()
+        with RouteStreamWriter(stream, "bin", buffer_size=1) as writer:
+            writer.write("Estacion_A", "Estacion_J", result)
+            writer.write("Estacion_A", "Estacion_Z", None)
+        stream.seek(0)
+        records = list(read_route_stream(stream))
+        if [(o, d, r is None) for o, d, r in records] != [("Estacion_A", "Estacion_J", False),
+                                                          ("Estacion_A", "Estacion_Z", True)]:
+            print(f"❌ Flujo binario incorrecto: {records}")
+            return False
+        
+        print(f"✅ {len(result.legs)} tramos para {len(result.path)} paradas; JSON y binario correctos")
+        return True
+    
+    def test_red_precalculada(self):
+        """Prueba: Una red guardada se carga con sus precálculos listos"""
+        import json
+        import os
+        import tempfile
+        
+        # Estacion_X no existe en la red de ejemplo: el lote debe usar la guardada
+        kb = build_sample_kb()
+        kb.add_connection("Estacion_J", "Estacion_X", "Línea_X", 5)
+        searcher = RouteSearcher(kb, search_type="transfer")
+        graph = searcher.transfer_graph()
+        expected = searcher.find_best_route("Estacion_A", "Estacion_J")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "red.pkl")
+            save_network(searcher, filename)
+            loaded = load_network(filename)
+            
+            queries, output = os.path.join(tmp, "consultas.csv"), os.path.join(tmp, "salida.jsonl")
+            with open(queries, 'w', encoding='utf-8') as file:
+                file.write("origin,dest\nEstacion_A,Estacion_X\n")
+            batch_mode(queries, output, filename)
+            with open(output, 'r', encoding='utf-8') as file:
+                routes = [json.loads(line)["route"] for line in file]
+            
+            # Un CSV que falta es un error, no una red vacía con resultados nulos
+            try:
+                batch_mode(queries, output, os.path.join(tmp, "no_existe.csv"))
+                print("❌ El modo por lotes aceptó un CSV de conexiones inexistente")
+                return False
+            except FileNotFoundError:
+                pass
+            
+            # Con un CSV de conexiones propio no se mezclan las coordenadas de datos/
+            connections = os.path.join(tmp, "conexiones.csv")
+            with open(connections, 'w', encoding='utf-8') as file:
+                file.write("origin,dest,line,time\nEstacion_A,Estacion_X,Línea_X,5\n")
+            csv_kb = load_kb_from_csv(connections)
+            if csv_kb.station_coords or len(csv_kb.edges) != 2:
+                print(f"❌ Red CSV incorrecta: {len(csv_kb.edges)} conexiones, "
+                      f"{len(csv_kb.station_coords)} estaciones con coordenadas")
+                return False
+            
+            # Una red vacía no se guarda
+            empty, empty_pkl = os.path.join(tmp, "vacia.csv"), os.path.join(tmp, "vacia.pkl")
+            with open(empty, 'w', encoding='utf-8') as file:
+                file.write("origin,dest,line,time\n")
+            try:
+                prebuild_network(empty_pkl, empty)
+                print("❌ prebuild guardó una red sin conexiones")
+                return False
+            except ValueError:
+                pass
+            if os.path.exists(empty_pkl):
+                print("❌ prebuild escribió el archivo de una red vacía")
+                return False
+        
+        if len(routes) != 1 or routes[0] is None:
+            print(f"❌ El modo por lotes no usó la red guardada: {routes}")
+            return False
+        
+        if loaded.transfer_graph() is not loaded._transfer_graph:
+            print("❌ El grafo de transbordos se reconstruyó al cargar la red")
+            return False
+        
+        obtained = loaded.find_best_route("Estacion_A", "Estacion_J")
+        if obtained is None or obtained.path != expected.path or obtained.legs != expected.legs:
+            print(f"❌ Ruta distinta tras cargar la red: {obtained}")
+            return False
+        
+        print(f"✅ Red cargada con {len(graph.key_stations)} estaciones clave precalculadas")
+        return True
+    
     def test_misma_estacion(self):
         """Prueba: Origen y destino iguales"""
         searcher = RouteSearcher(self.kb, search_type="astar")
@@ -255,6 +586,14 @@ class TestSuite:
         self.run_test("Ruta con Transbordos", self.test_ruta_con_transbordos)
         self.run_test("Comparación de Algoritmos", self.test_comparacion_algoritmos)
         self.run_test("Ruta Inexistente", self.test_ruta_inexistente)
+        self.run_test("Destino Inalcanzable", self.test_destino_inalcanzable)
+        self.run_test("Presupuesto de Búsqueda", self.test_presupuesto_busqueda)
+        self.run_test("Delta-stepping", self.test_delta_stepping)
+        self.run_test("Transbordos a Pie", self.test_transbordos_a_pie)
+        self.run_test("Grafo de Transbordos", self.test_grafo_transbordos)
+        self.run_test("Corpus de Referencia", self.test_corpus_golden)
+        self.run_test("Tramos y Serialización", self.test_tramos_y_serializacion)
+        self.run_test("Red Precalculada", self.test_red_precalculada)
         self.run_test("Misma Estación", self.test_misma_estacion)
         self.run_test("Heurística", self.test_heuristica)
         self.run_test("Rendimiento", self.test_rendimiento)
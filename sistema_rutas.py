@@ -1,10 +1,20 @@
+if __name__ == "__main__":
+    # Como script, el cuerpo se ejecuta una sola vez y como sistema_rutas:
+    # transfer_graph y delta_stepping importan ese mismo módulo, y las clases
+    # guardadas con pickle se cargan luego como sistema_rutas.*
+    import sys
+    from sistema_rutas import main
+    sys.exit(main(sys.argv[1:]))
+
 
 from dataclasses import dataclass, field
 import heapq
-import json
-import csv
 import math
+import struct
+import time
 from typing import Dict, List, Tuple, Optional, Set
+# csv, json, random y pickle solo se importan en las funciones que los usan,
+# para que importar el módulo o arrancar la CLI no pague su coste.
 
 @dataclass
 class Edge:
@@ -15,6 +25,15 @@ class Edge:
     distance: float = 0.0  # km
     cost: float = 0.0  # costo monetario
 
+@dataclass
+class Leg:
+    """Tramo del viaje en una sola línea (o a pie): de board a alight."""
+    line: str
+    board: str
+    alight: str
+    stops: int    # paradas recorridas después de subir
+    time: float   # minutos del tramo, sin penalización por transbordo
+
 @dataclass
 class RouteResult:
     path: List[Tuple[str, Optional[str]]]  # list of (stop, line used to arrive to this stop)
@@ -23,6 +42,83 @@ class RouteResult:
     total_distance: float = 0.0
     total_cost: float = 0.0
     lines_used: List[str] = field(default_factory=list)
+    legs: List[Leg] = field(default_factory=list)  # un tramo por línea recorrida
+
+def assemble_route(start: str, segments) -> Tuple[List[Tuple[str, Optional[str]]], List[Leg]]:
+    """
+    Construye la lista de paradas y los tramos a partir de los segmentos
+    recorridos, en orden: (línea, estaciones tras subir, minutos).
+    Los segmentos consecutivos de la misma línea se funden en un tramo.
+    Los minutos de los tramos son siempre float, aunque las conexiones usen enteros.
+    """
+    path: List[Tuple[str, Optional[str]]] = [(start, None)]
+    legs: List[Leg] = []
+    board = start
+    for line, stops, minutes in segments:
+        if legs and legs[-1].line == line:
+            leg = legs[-1]
+            leg.alight = stops[-1]
+            leg.stops += len(stops)
+            leg.time += minutes
+        else:
+            legs.append(Leg(line, board, stops[-1], len(stops), float(minutes)))
+        path.extend((stop, line) for stop in stops)
+        board = stops[-1]
+    return path, legs
+
+@dataclass
+class SearchStats:
+    """Estadísticas de la última búsqueda realizada por un RouteSearcher."""
+    status: str = "idle"  # found | unreachable | expansion_limit | time_limit | exhausted
+    expanded: int = 0     # estados (nodo, linea) extraídos de la cola
+    elapsed: float = 0.0  # segundos
+
+# Las conexiones cuya línea empieza por este prefijo son trayectos a pie
+# entre estaciones: no son una línea a la que se sube, así que no cuentan
+# como transbordo.
+WALKING_PREFIX = "Transferencia"
+
+def is_walking(line: Optional[str]) -> bool:
+    return line is not None and line.startswith(WALKING_PREFIX)
+
+def transition(cur_line: Optional[str], edge: Edge,
+               transfer_penalty: float) -> Tuple[Optional[str], float, int]:
+    """
+    Regla de transbordo compartida por todos los motores de búsqueda.
+    cur_line es la línea del estado actual (None si aún no se ha viajado).
+    Devuelve (línea del nuevo estado, penalización, transbordos añadidos):
+      - caminar no penaliza; si ya se había viajado, la línea del estado pasa
+        a WALKING_PREFIX (un único valor para cualquier conexión a pie), de
+        modo que la siguiente subida cuenta como transbordo;
+      - subir a una línea distinta de la del estado penaliza y cuenta un
+        transbordo. Así transfers = subidas a vehículos - 1.
+    """
+    if is_walking(edge.line):
+        return (None if cur_line is None else WALKING_PREFIX), 0.0, 0
+    if cur_line is None or cur_line == edge.line:
+        return edge.line, 0.0, 0
+    return edge.line, transfer_penalty, 1
+
+def admit_label(labels: Dict, state, label: Tuple, stops: int) -> bool:
+    """
+    Conjunto de etiquetas no dominadas por estado, compartido por los motores.
+    Una etiqueta (tiempo, transbordos, distancia, costo) con stops paradas se
+    descarta si otra del mismo estado es mejor o igual en ambas cosas; si se
+    admite, elimina las que domina. Con stops constante (sin max_stops) queda
+    una sola etiqueta por estado, la mejor en orden lexicográfico; por eso sin
+    max_stops los motores guardan directamente esa etiqueta, sin listas.
+    """
+    entries = labels.get(state)
+    if entries is None:
+        labels[state] = [(label, stops)]
+        return True
+    for other, other_stops in entries:
+        if other <= label and other_stops <= stops:
+            return False
+    entries[:] = [(other, other_stops) for other, other_stops in entries
+                  if not (label <= other and stops <= other_stops)]
+    entries.append((label, stops))
+    return True
 
 class KnowledgeBase:
     """
@@ -32,19 +128,76 @@ class KnowledgeBase:
     def __init__(self):
         self.edges: List[Edge] = []
         self.station_coords: Dict[str, Tuple[float, float]] = {}  # coordenadas para heurística
+        # Índices derivados de self.edges; se construyen bajo demanda
+        self._adjacency: Optional[Dict[str, List[Edge]]] = None
+        self._components: Optional[Dict[str, int]] = None
     
     def add_connection(self, origin: str, dest: str, line: str, time: float, 
                       distance: float = 0.0, cost: float = 0.0, bidirectional: bool = True):
         self.edges.append(Edge(origin, dest, line, time, distance, cost))
         if bidirectional:
             self.edges.append(Edge(dest, origin, line, time, distance, cost))
+        self.invalidate_indexes()
+    
+    def invalidate_indexes(self):
+        """Descarta los índices precalculados (llamar si se modifica self.edges a mano)"""
+        self._adjacency = None
+        self._components = None
     
     def add_station_coords(self, station: str, lat: float, lon: float):
         """Agregar coordenadas de una estación para cálculo de heurística"""
         self.station_coords[station] = (lat, lon)
     
+    def adjacency(self) -> Dict[str, List[Edge]]:
+        """Lista de adyacencia origen -> aristas salientes, en orden de inserción"""
+        if self._adjacency is None:
+            adjacency: Dict[str, List[Edge]] = {}
+            for e in self.edges:
+                adjacency.setdefault(e.origin, []).append(e)
+            self._adjacency = adjacency
+        return self._adjacency
+    
     def get_neighbors(self, node: str) -> List[Edge]:
-        return [e for e in self.edges if e.origin == node]
+        return self.adjacency().get(node, [])
+    
+    def components(self) -> Dict[str, int]:
+        """
+        Componentes débilmente conexas de la red: estación -> id de componente.
+        Si dos estaciones están en componentes distintas no existe ruta entre ellas.
+        """
+        if self._components is None:
+            undirected: Dict[str, List[str]] = {}
+            for e in self.edges:
+                undirected.setdefault(e.origin, []).append(e.dest)
+                undirected.setdefault(e.dest, []).append(e.origin)
+            components: Dict[str, int] = {}
+            comp_id = -1
+            for root in undirected:
+                if root in components:
+                    continue
+                comp_id += 1
+                components[root] = comp_id
+                stack = [root]
+                while stack:
+                    node = stack.pop()
+                    for neighbor in undirected[node]:
+                        if neighbor not in components:
+                            components[neighbor] = comp_id
+                            stack.append(neighbor)
+            self._components = components
+        return self._components
+    
+    def may_reach(self, origin: str, dest: str) -> bool:
+        """
+        Prueba rápida de alcanzabilidad basada en componentes precalculadas.
+        False garantiza que no hay ruta; True solo indica que podría haberla
+        (con conexiones unidireccionales la componente débil no basta).
+        """
+        if origin == dest:
+            return True
+        components = self.components()
+        comp = components.get(origin)
+        return comp is not None and comp == components.get(dest)
     
     def all_nodes(self) -> Set[str]:
         s = set()
@@ -53,8 +206,9 @@ class KnowledgeBase:
             s.add(e.dest)
         return s
     
-    def load_from_csv(self, filename: str):
-        """Cargar datos desde archivo CSV"""
+    def load_from_csv(self, filename: str, strict: bool = False):
+        """Cargar datos desde archivo CSV (strict: propagar los errores en vez de avisar)"""
+        import csv
         try:
             with open(filename, 'r', encoding='utf-8') as file:
                 reader = csv.DictReader(file)
@@ -68,12 +222,17 @@ class KnowledgeBase:
                     bidirectional = row.get('bidirectional', 'true').lower() == 'true'
                     self.add_connection(origin, dest, line, time, distance, cost, bidirectional)
         except FileNotFoundError:
+            if strict:
+                raise
             print(f"Archivo {filename} no encontrado")
         except Exception as e:
+            if strict:
+                raise ValueError(f"Error cargando CSV {filename}: {e!r}") from e
             print(f"Error cargando CSV: {e}")
     
-    def load_stations_from_csv(self, filename: str):
-        """Cargar coordenadas de estaciones desde CSV"""
+    def load_stations_from_csv(self, filename: str, strict: bool = False):
+        """Cargar coordenadas de estaciones desde CSV (strict: propagar los errores)"""
+        import csv
         try:
             with open(filename, 'r', encoding='utf-8') as file:
                 reader = csv.DictReader(file)
@@ -83,8 +242,12 @@ class KnowledgeBase:
                     lon = float(row['lon'])
                     self.add_station_coords(station, lat, lon)
         except FileNotFoundError:
+            if strict:
+                raise
             print(f"Archivo {filename} no encontrado")
         except Exception as e:
+            if strict:
+                raise ValueError(f"Error cargando estaciones {filename}: {e!r}") from e
             print(f"Error cargando estaciones: {e}")
 
 class RouteSearcher:
@@ -93,17 +256,36 @@ class RouteSearcher:
       - cost = suma de tiempos + penalty_por_transbordo * num_transbordos
     Se mantiene en el estado el (nodo_actual, linea_actual).
     """
+    # Cada cuántas expansiones se consulta el reloj cuando hay time_limit
+    TIME_CHECK_INTERVAL = 256
+    
     def __init__(self, kb: KnowledgeBase, transfer_penalty: float = 4.0, 
-                 use_heuristic: bool = True, search_type: str = "astar"):
+                 use_heuristic: bool = True, search_type: str = "astar",
+                 max_expansions: Optional[int] = None, time_limit: Optional[float] = None):
         """
         transfer_penalty: minutos extra que se suman cada vez que se cambia de linea.
         use_heuristic: si usar heurística para búsqueda A*
-        search_type: "dijkstra" o "astar"
+        search_type: "dijkstra", "astar" o "transfer" (grafo de transbordos precalculado)
+        max_expansions: máximo de estados expandidos por consulta (None = sin límite)
+        time_limit: máximo de segundos de reloj por consulta (None = sin límite)
         """
         self.kb = kb
         self.transfer_penalty = transfer_penalty
         self.use_heuristic = use_heuristic
         self.search_type = search_type
+        self.max_expansions = max_expansions
+        self.time_limit = time_limit
+        self.last_stats = SearchStats()
+        self._transfer_graph = None
+    
+    def transfer_graph(self):
+        """Grafo de transbordos de la red actual; se reconstruye si la red cambió"""
+        from transfer_graph import TransferGraph
+        graph = self._transfer_graph
+        if (graph is None or graph.adjacency is not self.kb.adjacency()
+                or graph.transfer_penalty != self.transfer_penalty):
+            graph = self._transfer_graph = TransferGraph(self.kb, self.transfer_penalty)
+        return graph
     
     def heuristic(self, current: str, goal: str) -> float:
         """Heurística basada en distancia euclidiana entre coordenadas"""
@@ -118,19 +300,77 @@ class RouteSearcher:
         # Convertir a tiempo estimado (asumiendo velocidad promedio de 30 km/h)
         return distance * 2.0  # minutos por grado de latitud/longitud
     
-    def find_best_route(self, start: str, goal: str, max_stops: int = 1000) -> Optional[RouteResult]:
-        # Priority queue: (cost_estimated, total_time, transfers, total_distance, total_cost, node, current_line, path_list)
-        # path_list: list of (stop, line_used_to_arrive_here), first element (start, None)
+    def find_best_route(self, start: str, goal: str, max_stops: Optional[int] = None,
+                        max_expansions: Optional[int] = None,
+                        time_limit: Optional[float] = None) -> Optional[RouteResult]:
+        """
+        Devuelve la mejor ruta o None. El motivo de un None (destino inalcanzable,
+        presupuesto agotado, ...) queda en self.last_stats.status.
+        max_stops: la ruta tiene como mucho max_stops + 1 estaciones (None = sin límite).
+        Con límite, un estado guarda también las etiquetas más lentas que usan menos
+        paradas, así que la ruta es la mejor entre las que caben en el límite.
+        max_expansions / time_limit sustituyen a los del buscador para esta consulta.
+        """
+        if max_expansions is None:
+            max_expansions = self.max_expansions
+        if time_limit is None:
+            time_limit = self.time_limit
+        started = time.perf_counter()
+        stats = self.last_stats = SearchStats(status="exhausted")
+        
+        if not self.kb.may_reach(start, goal):
+            stats.status = "unreachable"
+            stats.elapsed = time.perf_counter() - started
+            return None
+        deadline = started + time_limit if time_limit is not None else None
+        
+        if self.search_type == "transfer":
+            result = self.transfer_graph().search(start, goal, max_stops, max_expansions,
+                                                  deadline, stats, self.TIME_CHECK_INTERVAL)
+            stats.elapsed = time.perf_counter() - started
+            return result
+        
+        # Priority queue: (cost_estimated, total_time, transfers, total_distance, total_cost, counter, node, current_line, stops)
+        # El contador desempata sin comparar líneas (None frente a str)
         pq = []
         # cost initially 0, at start no line (None)
         initial_heuristic = self.heuristic(start, goal) if self.search_type == "astar" else 0.0
-        heapq.heappush(pq, (initial_heuristic, 0.0, 0, 0.0, 0.0, start, None, [(start, None)]))
-        # visited with best cost found for (node, line)
-        best_cost: Dict[Tuple[str, Optional[str]], float] = {(start, None): 0.0}
+        heapq.heappush(pq, (initial_heuristic, 0.0, 0, 0.0, 0.0, 0, start, None, 1))
+        pushed = 1
+        # etiquetas (tiempo, transbordos, distancia, costo) por (node, line), comparadas
+        # en orden lexicográfico como la cola: a igual tiempo gana la ruta con menos
+        # transbordos, sea cual sea el orden de exploración. Sin max_stops:
+        # estado -> etiqueta; con max_stops: estado -> [(etiqueta, paradas)] (admit_label)
+        limited = max_stops is not None
+        unreached = (float('inf'), 0, 0.0, 0.0)
+        best_cost: Dict[Tuple[str, Optional[str]], object] = {}
+        if limited:
+            admit_label(best_cost, (start, None), (0.0, 0, 0.0, 0.0), 1)
+        else:
+            best_cost[(start, None)] = (0.0, 0, 0.0, 0.0)
+        # ((node, line), paradas) -> (clave anterior, arista usada); la ruta se
+        # reconstruye al final. Sin límite las paradas de la clave son siempre 0.
+        parent: Dict[Tuple[Tuple[str, Optional[str]], int], Tuple[Tuple, Edge]] = {}
         
         while pq:
-            _, total_time, transfers, total_distance, total_cost, node, cur_line, path = heapq.heappop(pq)
+            if max_expansions is not None and stats.expanded >= max_expansions:
+                stats.status = "expansion_limit"
+                break
+            if (deadline is not None and stats.expanded % self.TIME_CHECK_INTERVAL == 0
+                    and time.perf_counter() > deadline):
+                stats.status = "time_limit"
+                break
+            _, total_time, transfers, total_distance, total_cost, _, node, cur_line, stops = heapq.heappop(pq)
+            rank = stops if limited else 0
+            key = ((node, cur_line), rank)
+            label = (total_time, transfers, total_distance, total_cost)
+            if ((label, rank) not in best_cost[key[0]]) if limited else (label > best_cost[key[0]]):
+                continue  # entrada obsoleta: el estado ya mejoró
+            stats.expanded += 1
             if node == goal:
+                stats.status = "found"
+                path, legs = self._reconstruct(key, parent, start)
+                stats.elapsed = time.perf_counter() - started
                 # Calcular líneas utilizadas
                 lines_used = list(set([line for _, line in path if line is not None]))
                 return RouteResult(
@@ -139,23 +379,18 @@ class RouteSearcher:
                     transfers=transfers,
                     total_distance=total_distance,
                     total_cost=total_cost,
-                    lines_used=lines_used
+                    lines_used=lines_used,
+                    legs=legs
                 )
-            if len(path) > max_stops:
+            if limited and stops > max_stops:
                 continue
+            next_rank = rank + 1 if limited else 0
             for edge in self.kb.get_neighbors(node):
                 next_node = edge.dest
                 travel = edge.time
-                next_line = edge.line
                 # determine if transfer occurs
-                additional_penalty = 0.0
-                additional_transfer = 0
-                if cur_line is None or cur_line == next_line:
-                    # same line or start: no transfer
-                    pass
-                else:
-                    additional_penalty += self.transfer_penalty
-                    additional_transfer = 1
+                next_line, additional_penalty, additional_transfer = transition(
+                    cur_line, edge, self.transfer_penalty)
                 
                 new_total_time = total_time + travel + additional_penalty
                 new_transfers = transfers + additional_transfer
@@ -163,10 +398,15 @@ class RouteSearcher:
                 new_total_cost = total_cost + edge.cost
                 
                 state = (next_node, next_line)
-                prev_best = best_cost.get(state, float('inf'))
-                if new_total_time < prev_best:
-                    best_cost[state] = new_total_time
-                    new_path = path + [(next_node, next_line)]
+                label = (new_total_time, new_transfers, new_total_distance, new_total_cost)
+                if limited:
+                    admitted = admit_label(best_cost, state, label, next_rank)
+                else:
+                    admitted = label < best_cost.get(state, unreached)
+                    if admitted:
+                        best_cost[state] = label
+                if admitted:
+                    parent[(state, next_rank)] = (key, edge)
                     
                     # Calcular costo estimado para la cola de prioridad
                     if self.search_type == "astar":
@@ -176,8 +416,48 @@ class RouteSearcher:
                         estimated_cost = new_total_time
                     
                     heapq.heappush(pq, (estimated_cost, new_total_time, new_transfers, 
-                                      new_total_distance, new_total_cost, next_node, next_line, new_path))
+                                      new_total_distance, new_total_cost, pushed, next_node, next_line,
+                                      stops + 1))
+                    pushed += 1
+        stats.elapsed = time.perf_counter() - started
         return None
+    
+    @staticmethod
+    def _reconstruct(state, parent, start: str):
+        """Paradas y tramos desde start hasta la clave state siguiendo los punteros parent"""
+        edges = []
+        while state in parent:
+            state, edge = parent[state]
+            edges.append(edge)
+        edges.reverse()
+        return assemble_route(start, [(e.line, (e.dest,), e.time) for e in edges])
+    
+    def one_to_all(self, start: str) -> Dict[str, float]:
+        """
+        Dijkstra de un origen a todas las estaciones sobre los mismos estados
+        (nodo, linea) y la misma penalización que find_best_route.
+        Devuelve estación -> tiempo mínimo (solo estaciones alcanzables).
+        """
+        # El contador desempata sin comparar líneas (None frente a str)
+        pq = [(0.0, 0, start, None)]
+        pushed = 1
+        best_cost: Dict[Tuple[str, Optional[str]], float] = {(start, None): 0.0}
+        station_time: Dict[str, float] = {}
+        while pq:
+            total_time, _, node, cur_line = heapq.heappop(pq)
+            if total_time > best_cost[(node, cur_line)]:
+                continue
+            if node not in station_time:
+                station_time[node] = total_time
+            for edge in self.kb.get_neighbors(node):
+                next_line, penalty, _ = transition(cur_line, edge, self.transfer_penalty)
+                new_total_time = total_time + edge.time + penalty
+                state = (edge.dest, next_line)
+                if new_total_time < best_cost.get(state, float('inf')):
+                    best_cost[state] = new_total_time
+                    heapq.heappush(pq, (new_total_time, pushed, edge.dest, next_line))
+                    pushed += 1
+        return station_time
 
 def build_sample_kb() -> KnowledgeBase:
     """
@@ -230,34 +510,216 @@ def build_sample_kb() -> KnowledgeBase:
     
     return kb
 
+def build_random_kb(n_stations: int, n_lines: int, stops_per_line: int,
+                    n_walks: int = 0, seed: Optional[int] = None, one_way: float = 0.0,
+                    circular: float = 0.0, integer_times: bool = False) -> KnowledgeBase:
+    """
+    Genera una red aleatoria reproducible (misma semilla -> misma red) para
+    pruebas de carga. Cada línea recorre stops_per_line estaciones distintas
+    y se añaden n_walks conexiones a pie "Transferencia_*". Por defecto todas
+    las conexiones son bidireccionales, así que la red tiene aproximadamente
+    2 * (n_lines * (stops_per_line - 1) + n_walks) aristas.
+    one_way: fracción de líneas que solo circulan en un sentido
+    circular: fracción de líneas que vuelven de la última parada a la primera
+    integer_times: minutos enteros, para que haya rutas empatadas en tiempo
+    """
+    import random
+    rng = random.Random(seed)
+    kb = KnowledgeBase()
+    stations = [f"Estacion_{i}" for i in range(n_stations)]
+    for station in stations:
+        kb.add_station_coords(station, 40.4 + rng.uniform(-0.05, 0.05),
+                              -3.7 + rng.uniform(-0.05, 0.05))
+    
+    def minutes(low: int, high: int) -> float:
+        return float(rng.randint(low, high)) if integer_times else rng.uniform(low, high)
+    
+    stops_per_line = min(stops_per_line, n_stations)
+    for line_id in range(n_lines):
+        line = f"Línea_{line_id}"
+        fare = round(rng.uniform(1.0, 3.0), 2)
+        stops = rng.sample(stations, stops_per_line)
+        # Sin variantes no se consumen números aleatorios extra: las redes
+        # generadas antes con la misma semilla no cambian
+        bidirectional = not (one_way and rng.random() < one_way)
+        if circular and rng.random() < circular and len(stops) > 2:
+            stops.append(stops[0])
+        for origin, dest in zip(stops, stops[1:]):
+            kb.add_connection(origin, dest, line, minutes(2, 10),
+                              rng.uniform(0.5, 6.0), fare, bidirectional=bidirectional)
+    for walk_id in range(n_walks):
+        origin, dest = rng.sample(stations, 2)
+        kb.add_connection(origin, dest, f"Transferencia_{walk_id}",
+                          minutes(3, 12), rng.uniform(0.1, 1.0), 0.0, bidirectional=True)
+    return kb
+
 def pretty_print_result(res: RouteResult):
     if res is None:
         print("No se encontró ruta.")
         return
     
-    print("=" * 60)
-    print("RUTA ENCONTRADA")
-    print("=" * 60)
+    out = ["=" * 60, "RUTA ENCONTRADA", "=" * 60]
     
-    stop_lines = []
     for i, (stop, line) in enumerate(res.path):
         if line is None:
-            stop_lines.append(f"{i+1}. {stop} (INICIO)")
+            out.append(f"{i+1}. {stop} (INICIO)")
         else:
-            stop_lines.append(f"{i+1}. {stop} [llegó con {line}]")
-    
-    for line in stop_lines:
-        print(line)
-    
-    print("\n" + "-" * 40)
-    print("RESUMEN DEL VIAJE:")
-    print("-" * 40)
-    print(f"⏱️  Tiempo total: {res.total_time:.1f} minutos")
-    print(f"🔄 Transbordos: {res.transfers}")
-    print(f"📏 Distancia total: {res.total_distance:.1f} km")
-    print(f"💰 Costo total: ${res.total_cost:.2f}")
-    print(f"🚇 Líneas utilizadas: {', '.join(res.lines_used)}")
-    print("=" * 60)
+            out.append(f"{i+1}. {stop} [llegó con {line}]")
+    
+    if res.legs:
+        out.append("\nTRAMOS:")
+        for leg in res.legs:
+            out.append(f"  • {leg.line}: {leg.board} → {leg.alight} "
+                       f"({leg.stops} paradas, {leg.time:.1f} min)")
+    
+    out.append("\n" + "-" * 40)
+    out.append("RESUMEN DEL VIAJE:")
+    out.append("-" * 40)
+    out.append(f"⏱️  Tiempo total: {res.total_time:.1f} minutos")
+    out.append(f"🔄 Transbordos: {res.transfers}")
+    out.append(f"📏 Distancia total: {res.total_distance:.1f} km")
+    out.append(f"💰 Costo total: ${res.total_cost:.2f}")
+    out.append(f"🚇 Líneas utilizadas: {', '.join(res.lines_used)}")
+    out.append("=" * 60)
+    print("\n".join(out))
+
+# --- Serialización compacta de rutas ---------------------------------------
+# Solo se serializan las métricas y los tramos (una entrada por línea), no
+# cada parada de res.path.
+
+_json_encoder = None
+_ROUTE_HEADER = struct.Struct("<dIddH")  # total_time, transfers, total_distance, total_cost, n_legs
+                                         # seguida de la estación de origen
+_LEG_BODY = struct.Struct("<Id")         # stops, time
+_STR_LEN = struct.Struct("<H")
+_RECORD_LEN = struct.Struct("<I")
+
+def route_to_dict(res: RouteResult) -> Dict:
+    """Forma compacta de la ruta: métricas y tramos [línea, subida, bajada, paradas, minutos]"""
+    return {
+        "total_time": res.total_time,
+        "transfers": res.transfers,
+        "total_distance": res.total_distance,
+        "total_cost": res.total_cost,
+        "legs": [[leg.line, leg.board, leg.alight, leg.stops, leg.time] for leg in res.legs],
+    }
+
+def _get_json_encoder():
+    """Codificador JSON compacto, creado (e importado json) en el primer uso"""
+    global _json_encoder
+    if _json_encoder is None:
+        import json
+        _json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    return _json_encoder
+
+def route_to_json(res: RouteResult) -> str:
+    return _get_json_encoder().encode(route_to_dict(res))
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode('utf-8')
+    return _STR_LEN.pack(len(data)) + data
+
+def _unpack_str(data: bytes, offset: int) -> Tuple[str, int]:
+    (size,) = _STR_LEN.unpack_from(data, offset)
+    offset += _STR_LEN.size
+    return data[offset:offset + size].decode('utf-8'), offset + size
+
+def route_to_bytes(res: RouteResult) -> bytes:
+    """
+    Forma binaria: cabecera con las métricas, estación de origen y, por tramo,
+    línea, estación de subida y de bajada (cadenas UTF-8 con prefijo de
+    longitud), paradas y minutos.
+    """
+    parts = [_ROUTE_HEADER.pack(res.total_time, res.transfers, res.total_distance,
+                                res.total_cost, len(res.legs)),
+             _pack_str(res.path[0][0] if res.path else "")]
+    for leg in res.legs:
+        parts.append(_pack_str(leg.line))
+        parts.append(_pack_str(leg.board))
+        parts.append(_pack_str(leg.alight))
+        parts.append(_LEG_BODY.pack(leg.stops, leg.time))
+    return b"".join(parts)
+
+def route_from_bytes(data: bytes) -> RouteResult:
+    """
+    Inversa de route_to_bytes. La forma binaria no guarda las paradas
+    intermedias, así que path solo contiene el origen y las estaciones de
+    bajada de cada tramo (solo el origen si origen y destino coinciden).
+    """
+    total_time, transfers, total_distance, total_cost, n_legs = _ROUTE_HEADER.unpack_from(data)
+    origin, offset = _unpack_str(data, _ROUTE_HEADER.size)
+    legs = []
+    for _ in range(n_legs):
+        line, offset = _unpack_str(data, offset)
+        board, offset = _unpack_str(data, offset)
+        alight, offset = _unpack_str(data, offset)
+        stops, minutes = _LEG_BODY.unpack_from(data, offset)
+        offset += _LEG_BODY.size
+        legs.append(Leg(line, board, alight, stops, minutes))
+    path: List[Tuple[str, Optional[str]]] = [(origin, None)] if origin else []
+    path.extend((leg.alight, leg.line) for leg in legs)
+    return RouteResult(path=path, total_time=total_time, transfers=transfers,
+                       total_distance=total_distance, total_cost=total_cost,
+                       lines_used=list(set(leg.line for leg in legs)), legs=legs)
+
+class RouteStreamWriter:
+    """
+    Escritura en flujo de resultados de un lote de consultas.
+      - fmt="jsonl": una línea JSON por consulta en un flujo de texto
+        {"origin": ..., "dest": ..., "route": route_to_dict(...) o null}
+      - fmt="bin": registros <longitud uint32><origen><destino><route_to_bytes>
+        en un flujo binario; una ruta vacía indica que no hubo resultado
+    Los registros se acumulan y se escriben en bloques de buffer_size.
+    """
+    def __init__(self, stream, fmt: str = "jsonl", buffer_size: int = 1000):
+        if fmt not in ("jsonl", "bin"):
+            raise ValueError(f"Formato no soportado: {fmt}")
+        self.stream = stream
+        self.fmt = fmt
+        self.buffer_size = buffer_size
+        self._buffer: list = []
+        self._encode = _get_json_encoder().encode if fmt == "jsonl" else None
+        self.count = 0
+    
+    def write(self, origin: str, dest: str, res: Optional[RouteResult]):
+        if self.fmt == "jsonl":
+            route = None if res is None else route_to_dict(res)
+            self._buffer.append(self._encode({"origin": origin, "dest": dest, "route": route}))
+            self._buffer.append("\n")
+        else:
+            body = _pack_str(origin) + _pack_str(dest) + (b"" if res is None else route_to_bytes(res))
+            self._buffer.append(_RECORD_LEN.pack(len(body)))
+            self._buffer.append(body)
+        self.count += 1
+        if len(self._buffer) >= 2 * self.buffer_size:
+            self.flush()
+    
+    def flush(self):
+        if self._buffer:
+            self.stream.write(("" if self.fmt == "jsonl" else b"").join(self._buffer))
+            self._buffer = []
+        self.stream.flush()
+    
+    def close(self):
+        self.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def read_route_stream(stream):
+    """Lee un flujo binario de RouteStreamWriter: genera (origen, destino, ruta o None)"""
+    while True:
+        header = stream.read(_RECORD_LEN.size)
+        if len(header) < _RECORD_LEN.size:
+            return
+        (size,) = _RECORD_LEN.unpack(header)
+        body = stream.read(size)
+        origin, offset = _unpack_str(body, 0)
+        dest, offset = _unpack_str(body, offset)
+        yield origin, dest, (route_from_bytes(body[offset:]) if offset < len(body) else None)
 
 def demo():
     print("🚇 SISTEMA INTELIGENTE DE RUTAS DE TRANSPORTE MASIVO 🚇")
@@ -305,6 +767,8 @@ def demo():
     print("De Estacion_A a Estacion_Z (estación inexistente)")
     res4 = searcher_astar.find_best_route("Estacion_A", "Estacion_Z")
     pretty_print_result(res4)
+    print(f"Motivo: {searcher_astar.last_stats.status} "
+          f"({searcher_astar.last_stats.expanded} estados expandidos)")
     
     print("\n" + "=" * 80)
     print("✅ DEMO COMPLETADA")
@@ -355,7 +819,6 @@ def run_performance_test():
         print(f"\n🔍 Ruta: {start} → {goal}")
         
         # A*
-        import time
         start_time = time.time()
         searcher_astar = RouteSearcher(kb, search_type="astar")
         res_astar = searcher_astar.find_best_route(start, goal)
@@ -416,20 +879,138 @@ def interactive_mode():
         except Exception as e:
             print(f"❌ Error: {e}")
 
-if __name__ == "__main__":
+def batch_mode(queries_file: str, output_file: Optional[str] = None,
+               network_file: Optional[str] = None, stations_file: Optional[str] = None):
+    """
+    Resuelve un lote de consultas (CSV con columnas origin,dest) y escribe los
+    resultados en flujo: JSON Lines por defecto o binario si la salida acaba en .bin.
+    network_file: red precalculada (.pkl de prebuild) o CSV de conexiones, con
+    stations_file opcional para las coordenadas; sin él se usa la red de ejemplo.
+    output_file None o "-" escribe en stdout.
+    """
+    import csv
     import sys
-    
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "demo":
-            demo()
-        elif sys.argv[1] == "analyze":
-            kb = build_sample_kb()
-            analyze_network(kb)
-        elif sys.argv[1] == "performance":
-            run_performance_test()
-        elif sys.argv[1] == "interactive":
-            interactive_mode()
-        else:
-            print("Uso: python sistema_rutas.py [demo|analyze|performance|interactive]")
+    if network_file is None:
+        searcher = RouteSearcher(build_sample_kb(), search_type="transfer")
+    elif network_file.endswith(".pkl"):
+        searcher = load_network(network_file)
     else:
+        searcher = RouteSearcher(load_kb_from_csv(network_file, stations_file),
+                                 search_type="transfer")
+    if output_file == "-":
+        output_file = None
+    
+    binary = output_file is not None and output_file.endswith(".bin")
+    if output_file is None:
+        stream = sys.stdout
+    else:
+        stream = open(output_file, 'wb' if binary else 'w', encoding=None if binary else 'utf-8')
+    try:
+        with open(queries_file, 'r', encoding='utf-8') as file, \
+                RouteStreamWriter(stream, "bin" if binary else "jsonl") as writer:
+            for row in csv.DictReader(file):
+                origin, dest = row['origin'], row['dest']
+                writer.write(origin, dest, searcher.find_best_route(origin, dest))
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    if output_file is not None:
+        print(f"✅ {writer.count} rutas escritas en {output_file}")
+
+def save_network(searcher: RouteSearcher, filename: str):
+    """Guarda el buscador con la red y todos sus precálculos (índices, grafo de transbordos)"""
+    import pickle
+    with open(filename, 'wb') as file:
+        pickle.dump(searcher, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_network(filename: str) -> RouteSearcher:
+    """Carga un buscador guardado con save_network (usar solo archivos propios: es pickle)"""
+    import pickle
+    with open(filename, 'rb') as file:
+        return pickle.load(file)
+
+def load_kb_from_csv(connections_file: Optional[str] = None,
+                     stations_file: Optional[str] = None) -> KnowledgeBase:
+    """
+    Red desde CSV de conexiones y de estaciones. Sin connections_file se usan
+    los dos CSV de datos/; con él, solo se cargan coordenadas si se indica
+    stations_file. Un archivo que falta o no se puede leer lanza una excepción
+    (FileNotFoundError o ValueError) en vez de devolver una red incompleta.
+    """
+    import os
+    if connections_file is None:
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos")
+        connections_file = os.path.join(data_dir, "conexiones.csv")
+        stations_file = stations_file or os.path.join(data_dir, "estaciones.csv")
+    kb = KnowledgeBase()
+    kb.load_from_csv(connections_file, strict=True)
+    if stations_file is not None:
+        kb.load_stations_from_csv(stations_file, strict=True)
+    return kb
+
+def prebuild_network(output_file: str, connections_file: Optional[str] = None,
+                     stations_file: Optional[str] = None):
+    """
+    Construye la red desde los CSV, precalcula todo lo necesario y la guarda.
+    Un CSV que falta o una red sin conexiones lanzan una excepción antes de
+    escribir output_file.
+    """
+    kb = load_kb_from_csv(connections_file, stations_file)
+    if not kb.edges:
+        raise ValueError(f"La red de {connections_file or 'datos/conexiones.csv'} no tiene conexiones")
+    searcher = RouteSearcher(kb, search_type="transfer")
+    kb.components()
+    searcher.transfer_graph()
+    save_network(searcher, output_file)
+    print(f"✅ Red guardada en {output_file}: {len(kb.all_nodes())} estaciones, "
+          f"{len(kb.edges)} conexiones")
+
+def serve_mode(network_file: str):
+    """
+    Carga una red precalculada una sola vez y responde consultas desde stdin,
+    una por línea ("origen,destino" u "origen destino"), con una línea JSON
+    por respuesta en stdout.
+    """
+    import sys
+    searcher = load_network(network_file)
+    find_best_route = searcher.find_best_route
+    with RouteStreamWriter(sys.stdout, "jsonl", buffer_size=1) as writer:
+        for line in sys.stdin:
+            parts = line.replace(",", " ").split()
+            if not parts:
+                continue
+            if len(parts) != 2:
+                print(f"Consulta inválida: {line.strip()}", file=sys.stderr)
+                continue
+            writer.write(parts[0], parts[1], find_best_route(parts[0], parts[1]))
+
+def main(argv: List[str]) -> int:
+    """Punto de entrada de la CLI; devuelve el código de salida"""
+    import sys
+    command = argv[0] if argv else "demo"
+    if command == "demo":
         demo()
+    elif command == "analyze":
+        analyze_network(build_sample_kb())
+    elif command == "performance":
+        run_performance_test()
+    elif command == "interactive":
+        interactive_mode()
+    elif command in ("batch", "prebuild", "serve") and len(argv) > 1:
+        try:
+            if command == "batch":
+                batch_mode(*argv[1:5])
+            elif command == "prebuild":
+                prebuild_network(*argv[1:4])
+            else:
+                serve_mode(argv[1])
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+    else:
+        print("Uso: python sistema_rutas.py [demo|analyze|performance|interactive]")
+        print("     python sistema_rutas.py batch <consultas.csv> [salida.jsonl|salida.bin|-] "
+              "[red.pkl|conexiones.csv] [estaciones.csv]")
+        print("     python sistema_rutas.py prebuild <red.pkl> [conexiones.csv] [estaciones.csv]")
+        print("     python sistema_rutas.py serve <red.pkl>")
+    return 0
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Grafo de transbordos precalculado.
+
+El preprocesamiento distingue estaciones clave (donde hay transbordo,
+conexión a pie, bifurcación o fin de línea) y colapsa los tramos
+consecutivos de una misma línea entre estaciones clave en un único tramo
+"exprés" con su tiempo, distancia, costo y paradas. El resultado se guarda
+en tablas compactas por estación:
+  - rides: estación clave -> [(línea, tramos exprés que salen de ella)]
+  - walks: estación -> conexiones a pie que salen de ella
+  - passes: estación no clave -> tramos exprés que pasan por ella
+Las consultas solo crean estados en estaciones clave (más origen y destino)
+y aplican la misma regla de transbordo que RouteSearcher
+(sistema_rutas.transition).
+"""
+
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sistema_rutas import (Edge, KnowledgeBase, RouteResult, SearchStats, admit_label,
+                           assemble_route, is_walking, transition)
+
+# Tramo exprés: (destino, tiempo, distancia, costo, paradas, estaciones recorridas).
+# Un tramo parcial comparte la tupla de estaciones del tramo completo y solo
+# usa las primeras `paradas`.
+Ride = Tuple[str, float, float, float, int, Tuple[str, ...]]
+State = Tuple[str, Optional[str]]
+
+
+class TransferGraph:
+    """Tablas de tramos exprés y trayectos a pie para consultas rápidas."""
+
+    def __init__(self, kb: KnowledgeBase, transfer_penalty: float = 4.0):
+        self.transfer_penalty = transfer_penalty
+        self.adjacency = kb.adjacency()  # identifica la versión de la red precalculada
+        self.line_adj: Dict[str, Dict[str, List[Edge]]] = {}
+        self.walks: Dict[str, List[Edge]] = {}
+        for e in kb.edges:
+            if is_walking(e.line):
+                self.walks.setdefault(e.origin, []).append(e)
+            else:
+                self.line_adj.setdefault(e.line, {}).setdefault(e.origin, []).append(e)
+
+        self.station_lines: Dict[str, List[str]] = {}
+        in_neighbors: Dict[Tuple[str, str], set] = {}
+        for line, adj in self.line_adj.items():
+            stations = set(adj)
+            for origin, edges in adj.items():
+                for e in edges:
+                    stations.add(e.dest)
+                    in_neighbors.setdefault((line, e.dest), set()).add(origin)
+            for station in stations:
+                self.station_lines.setdefault(station, []).append(line)
+
+        # Estaciones clave: varias líneas, conexión a pie o recorrido no lineal
+        self.key_stations = {s for s, lines in self.station_lines.items() if len(lines) > 1}
+        for origin, edges in self.walks.items():
+            self.key_stations.add(origin)
+            self.key_stations.update(e.dest for e in edges)
+        # Estación intermedia de una sola línea -> sus dos vecinas en esa línea
+        self._chain_neighbors: Dict[str, Tuple[str, str]] = {}
+        for station, lines in self.station_lines.items():
+            if station in self.key_stations:
+                continue
+            out_neighbors = {e.dest for e in self.line_adj[lines[0]].get(station, ())}
+            if len(out_neighbors) == 2 and out_neighbors == in_neighbors.get((lines[0], station)):
+                self._chain_neighbors[station] = tuple(out_neighbors)
+            else:
+                self.key_stations.add(station)
+
+        self.rides: Dict[str, List[Tuple[str, List[Ride]]]] = {}
+        self.passes: Dict[str, List[Tuple[str, str, Ride]]] = {}
+        for station in self.key_stations:
+            groups, partials = self._rides_from(station)
+            self.rides[station] = groups
+            for line, partial in partials:
+                self.passes.setdefault(partial[0], []).append((station, line, partial))
+
+    def _step(self, line: str, origin: str, dest: str) -> Edge:
+        """Conexión de origin a dest en line con menor (tiempo, distancia, costo)."""
+        best = None
+        for e in self.line_adj[line][origin]:
+            if e.dest == dest and (best is None or (e.time, e.distance, e.cost)
+                                   < (best.time, best.distance, best.cost)):
+                best = e
+        return best
+
+    def _rides_from(self, station: str):
+        """
+        Sigue cada conexión de la estación hasta la siguiente estación clave.
+        Devuelve (tramos agrupados por línea, [(línea, tramo parcial)] hasta
+        cada estación intermedia).
+        """
+        groups: List[Tuple[str, List[Ride]]] = []
+        partials: List[Tuple[str, Ride]] = []
+        for line in self.station_lines.get(station, ()):
+            entries: List[Ride] = []
+            for edge in self.line_adj[line].get(station, ()):
+                # Acumulado arista a arista, en el mismo orden que el buscador
+                t, d, c = edge.time, edge.distance, edge.cost
+                stops = [edge.dest]
+                cumulative = [(t, d, c)]
+                prev, cur = station, edge.dest
+                while cur not in self.key_stations and cur != station:
+                    a, b = self._chain_neighbors[cur]
+                    nxt = b if prev == a else a
+                    step = self._step(line, cur, nxt)
+                    t, d, c = t + step.time, d + step.distance, c + step.cost
+                    stops.append(nxt)
+                    cumulative.append((t, d, c))
+                    prev, cur = cur, nxt
+                stops_tuple = tuple(stops)
+                for i in range(len(stops) - 1):
+                    pt, pd, pc = cumulative[i]
+                    partials.append((line, (stops[i], pt, pd, pc, i + 1, stops_tuple)))
+                if cur != station:  # en una línea circular sin estaciones clave no hay tramo
+                    entries.append((cur, t, d, c, len(stops), stops_tuple))
+            if entries:
+                groups.append((line, entries))
+        return groups, partials
+
+    def search(self, start: str, goal: str, max_stops: Optional[int] = None,
+               max_expansions: Optional[int] = None, deadline: Optional[float] = None,
+               stats: Optional[SearchStats] = None,
+               time_check_interval: int = 256) -> Optional[RouteResult]:
+        """
+        Dijkstra sobre estados (estación, línea del estado) unidos por tramos
+        exprés y trayectos a pie. Actualiza stats igual que RouteSearcher.
+        """
+        if stats is None:
+            stats = SearchStats(status="exhausted")
+        transfer_penalty = self.transfer_penalty
+        key_stations = self.key_stations
+        # Igual que RouteSearcher: solo se expanden estados con stops <= max_stops,
+        # así que una ruta llega como mucho a max_stops + 1 estaciones, y con
+        # límite las paradas cuentan en la dominancia de etiquetas (admit_label)
+        limited = max_stops is not None
+        stop_limit = max_stops + 1 if limited else None
+        unreached = (float('inf'), 0, 0.0, 0.0)
+
+        # Tramos que terminan en el destino cuando no es estación clave
+        goal_rides: Dict[str, List[Tuple[str, Ride]]] = {}
+        for board, line, partial in self.passes.get(goal, ()):
+            goal_rides.setdefault(board, []).append((line, partial))
+        if start not in key_stations and start in self.station_lines:
+            start_groups, start_partials = self._rides_from(start)
+            goal_rides.setdefault(start, []).extend(
+                (line, partial) for line, partial in start_partials if partial[0] == goal)
+        else:
+            start_groups = None
+
+        # (tiempo, transbordos, distancia, costo, paradas, contador, estación, línea)
+        pq = [(0.0, 0, 0.0, 0.0, 1, 0, start, None)]
+        pushed = 1
+        # Etiquetas (tiempo, transbordos, distancia, costo) por estado, comparadas
+        # igual que en RouteSearcher: una por estado sin límite, o una lista
+        # [(etiqueta, paradas)] no dominadas con max_stops
+        best: Dict[State, object] = {}
+        if limited:
+            admit_label(best, (start, None), (0.0, 0, 0.0, 0.0), 1)
+        else:
+            best[(start, None)] = (0.0, 0, 0.0, 0.0)
+        # (estado, paradas) -> (clave anterior, línea de llegada, estaciones recorridas,
+        # minutos); sin límite las paradas de la clave son siempre 0
+        parent: Dict[Tuple[State, int], Tuple[Tuple[State, int], str, Tuple[str, ...], float]] = {}
+
+        while pq:
+            if max_expansions is not None and stats.expanded >= max_expansions:
+                stats.status = "expansion_limit"
+                return None
+            if (deadline is not None and stats.expanded % time_check_interval == 0
+                    and time.perf_counter() > deadline):
+                stats.status = "time_limit"
+                return None
+            total_time, transfers, distance, cost, stops, _, station, cur_line = heapq.heappop(pq)
+            state = (station, cur_line)
+            rank = stops if limited else 0
+            key = (state, rank)
+            label = (total_time, transfers, distance, cost)
+            if ((label, rank) not in best[state]) if limited else (label > best[state]):
+                continue
+            stats.expanded += 1
+            if station == goal:
+                stats.status = "found"
+                path, legs = self._reconstruct(key, parent, start)
+                return RouteResult(
+                    path=path,
+                    total_time=total_time,
+                    transfers=transfers,
+                    total_distance=distance,
+                    total_cost=cost,
+                    lines_used=list(set(line for _, line in path if line is not None)),
+                    legs=legs
+                )
+            if limited and stops > max_stops:
+                continue
+
+            groups = start_groups if station == start and start_groups is not None \
+                else self.rides.get(station, [])
+            if station in goal_rides:
+                groups = groups + [(line, [ride]) for line, ride in goal_rides[station]]
+            for line, entries in groups:
+                # Misma regla que transition() al subir a una línea
+                if cur_line is None or cur_line == line:
+                    penalty, change = 0.0, 0
+                else:
+                    penalty, change = transfer_penalty, 1
+                for dest, t, d, c, n, ride_stops in entries:
+                    if limited and stops + n > stop_limit:
+                        continue
+                    label = (total_time + penalty + t, transfers + change, distance + d, cost + c)
+                    next_state = (dest, line)
+                    next_rank = rank + n if limited else 0
+                    if limited:
+                        if not admit_label(best, next_state, label, next_rank):
+                            continue
+                    elif label < best.get(next_state, unreached):
+                        best[next_state] = label
+                    else:
+                        continue
+                    parent[(next_state, next_rank)] = (key, line, ride_stops[:n], t)
+                    heapq.heappush(pq, label + (stops + n, pushed, dest, line))
+                    pushed += 1
+            for edge in self.walks.get(station, ()):
+                next_line, penalty, change = transition(cur_line, edge, transfer_penalty)
+                label = (total_time + edge.time + penalty, transfers + change,
+                         distance + edge.distance, cost + edge.cost)
+                next_state = (edge.dest, next_line)
+                next_rank = rank + 1 if limited else 0
+                if limited:
+                    if not admit_label(best, next_state, label, next_rank):
+                        continue
+                elif label < best.get(next_state, unreached):
+                    best[next_state] = label
+                else:
+                    continue
+                parent[(next_state, next_rank)] = (key, edge.line, (edge.dest,), edge.time)
+                heapq.heappush(pq, label + (stops + 1, pushed, edge.dest, next_line))
+                pushed += 1
+        return None
+
+    def _reconstruct(self, key: Tuple[State, int], parent, start: str):
+        """Expande tramos exprés y trayectos a pie en paradas y tramos por línea."""
+        segments = []
+        while key in parent:
+            key, line, stops, minutes = parent[key]
+            segments.append((line, stops, minutes))
+        segments.reverse()
+        return assemble_route(start, segments)